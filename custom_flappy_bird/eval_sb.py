@@ -4,14 +4,13 @@ import pathlib
 import os
 import glob
 
-# import gymnasium as gym
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.evaluation import evaluate_policy
+import gymnasium as gym
 from gymnasium.envs.registration import register
+from gym_env.assets import preload_assets
 from utils.utils import get_time_str, load_config
 # from utils.sb3_callbacks import FlapActionMetricCallback
 from utils.wrappers import RecordBestVideo
+from utils.trace import RecordTrace
 
 models_dir = pathlib.Path(__file__).parent.parent.resolve().joinpath('models')
 run = 'PPO_20250225-210152'
@@ -24,33 +23,113 @@ config = load_config(config_path)
 
 num_cpu = 10
 n_eval_episodes = 20
+seed = 0
+# Run the policy with NumPy instead of loading sb3/torch. The .npz is
+# exported next to the model the first time, which does still need sb3.
+use_numpy_policy = False
+# With use_numpy_policy, step the envs asynchronously in a process pool and
+# serve all of them from one batched policy server in this process
+use_inference_server = False
+# Folder to record every eval step to (see utils/trace.py), or None
+trace_folder = None
+
+# Evaluate on a fixed pool of pipe layouts so that different checkpoints
+# see the same levels, and always from a normal start
+env_kwargs = {
+    **config['env_kwargs'],
+    'hard_reset_prob': 0.0,
+    'pipe_pool_size': n_eval_episodes,
+    'pipe_pool_seed': seed,
+}
 
 register(
      id="CustomFlappyBirdEnv",
      entry_point="gym_env.custom_flappy_env:CustomFlappyBirdEnv",
 )
 
-vec_env = make_vec_env(
-    "CustomFlappyBirdEnv",
-    n_envs=num_cpu,
-    env_kwargs=config['env_kwargs'],
-    monitor_dir='./monitor',
-    wrapper_class=RecordBestVideo,
-    wrapper_kwargs={
-          'video_folder': f'./replays/eval/run_{get_time_str()}',
-          'name_prefix': "sb3-flappy",
-          'record_mode': "best",
-          'reward_in_name': True,
-          'second_metric': 'score',
-    }
+# Decode the sprites once here, so that forked workers share them
+preload_assets(**env_kwargs)
+
+video_kwargs = {
+      'video_folder': f'./replays/eval/run_{get_time_str()}',
+      'name_prefix': "sb3-flappy",
+      'record_mode': "best",
+      'reward_in_name': True,
+      'second_metric': 'score',
+}
+
+
+def wrap_env(env: gym.Env) -> gym.Env:
+    env = RecordBestVideo(env, **video_kwargs)
+    if trace_folder is not None:
+        env = RecordTrace(env, trace_folder)
+    return env
+
+
+if use_numpy_policy:
+    from utils.numpy_policy import (
+        NumpyPolicy,
+        export_policy,
+        evaluate_numpy_policy,
     )
-alg = PPO.load(model, env=vec_env, device='cpu')
 
-mean_reward, std_reward = evaluate_policy(
-    alg,
-    env=vec_env,
-    n_eval_episodes=n_eval_episodes,
+    policy_path = os.path.splitext(model)[0] + '.npz'
+    if not os.path.exists(policy_path):
+        export_policy(model, policy_path)
+    policy = NumpyPolicy.load(policy_path, seed=seed)
+
+if use_numpy_policy and use_inference_server:
+    import numpy as np
+    from utils.inference_server import evaluate_with_server
+
+    results = evaluate_with_server(
+        policy,
+        "CustomFlappyBirdEnv",
+        n_workers=num_cpu,
+        n_eval_episodes=n_eval_episodes,
+        env_kwargs=env_kwargs,
+        seed=seed,
+        wrappers=[wrap_env],
+    )
+    episode_rewards = [reward for reward, _, _ in results]
+    mean_reward = float(np.mean(episode_rewards))
+    std_reward = float(np.std(episode_rewards))
+elif use_numpy_policy:
+    vec_env = gym.make_vec(
+        "CustomFlappyBirdEnv",
+        num_envs=num_cpu,
+        vectorization_mode='async',
+        wrappers=[wrap_env],
+        **env_kwargs
     )
+    mean_reward, std_reward = evaluate_numpy_policy(
+        policy,
+        envs=vec_env,
+        n_eval_episodes=n_eval_episodes,
+        seed=seed,
+    )
+    vec_env.close()
+else:
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.evaluation import evaluate_policy
+
+    vec_env = make_vec_env(
+        "CustomFlappyBirdEnv",
+        n_envs=num_cpu,
+        seed=seed,
+        env_kwargs=env_kwargs,
+        monitor_dir='./monitor',
+        wrapper_class=wrap_env,
+        )
+    alg = PPO.load(model, env=vec_env, device='cpu')
+
+    mean_reward, std_reward = evaluate_policy(
+        alg,
+        env=vec_env,
+        n_eval_episodes=n_eval_episodes,
+        )
+    vec_env.close()
 
 print('Mean reward: ', mean_reward)
 print('Std reward: ', std_reward)
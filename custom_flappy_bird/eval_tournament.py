@@ -0,0 +1,73 @@
+"""
+Evaluate several saved policies against the same seeded episodes and rank
+them, to help choose which model to submit
+"""
+
+import pathlib
+import os
+import glob
+
+from gymnasium.envs.registration import register
+from gym_env.assets import preload_assets
+from utils.utils import get_time_str, load_config
+from utils.tournament import (
+    load_checkpoints,
+    make_tournament_envs,
+    run_tournament,
+    save_results,
+    format_table,
+)
+
+models_dir = pathlib.Path(__file__).parent.parent.resolve().joinpath('models')
+# Run folders in models_dir (their best_model is used), or paths to any
+# model .zip / exported .npz
+runs = [
+    'PPO_20250225-210152',
+]
+
+num_cpu = 10
+n_eval_episodes = 20
+seed = 0
+
+checkpoints = [
+    run if os.path.exists(run) else os.path.join(models_dir, run)
+    for run in runs
+]
+
+# Env settings come from the first run's config, without rendering and
+# always from a normal start, on a fixed pool of pipe layouts
+config_folder = checkpoints[0] if os.path.isdir(checkpoints[0]) \
+    else os.path.dirname(checkpoints[0])
+config = load_config(glob.glob(os.path.join(config_folder, '*.json'))[0])
+env_kwargs = {
+    **config['env_kwargs'],
+    'render_mode': None,
+    'hard_reset_prob': 0.0,
+    'pipe_pool_size': n_eval_episodes,
+    'pipe_pool_seed': seed,
+}
+
+register(
+     id="CustomFlappyBirdEnv",
+     entry_point="gym_env.custom_flappy_env:CustomFlappyBirdEnv",
+)
+
+policies = load_checkpoints(checkpoints)
+# A no-op without rendering, decodes once for forked workers otherwise
+preload_assets(**env_kwargs)
+envs = make_tournament_envs("CustomFlappyBirdEnv", num_cpu, **env_kwargs)
+table = run_tournament(policies, envs, n_eval_episodes=n_eval_episodes,
+                       seed=seed)
+envs.close()
+
+print(format_table(table))
+save_results(
+    table,
+    folder=os.path.join('./tournaments', f'run_{get_time_str()}'),
+    meta={
+        'checkpoints': checkpoints,
+        'n_eval_episodes': n_eval_episodes,
+        'seed': seed,
+        'env_kwargs': env_kwargs,
+    }
+)
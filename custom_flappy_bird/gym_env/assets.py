@@ -0,0 +1,126 @@
+"""Process-wide cache of decoded sprites shared by CustomFlappyBirdEnv"""
+
+from functools import cached_property
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pygame
+from flappy_bird_gymnasium.envs import utils
+
+
+class SpriteAssets:
+    """
+    Decoded sprites for one (bird_color, pipe_color, background, screen_size)
+
+    images: pygame Surfaces in the layout FlappyBirdEnv expects for blitting
+    arrays: read-only HxWx4 uint8 RGBA copies of every sprite
+    hitmasks: read-only boolean alpha masks indexed [x, y] like
+      flappy_bird_gymnasium.envs.utils.get_hitmask
+
+    The env only blits images, so arrays and hitmasks are built on first
+    access rather than holding a second copy of every sprite in each worker.
+    """
+
+    def __init__(self, images: Dict[str, Any]):
+        self.images = images
+
+    @cached_property
+    def arrays(self) -> Dict[str, Any]:
+        return _map_sprites(self.images, _to_rgba)
+
+    @cached_property
+    def hitmasks(self) -> Dict[str, Any]:
+        return _map_sprites(self.images, _to_hitmask)
+
+
+# Filled lazily and never mutated after insertion, so forked vec env workers
+# share the pages copy-on-write with the parent if it called preload_assets()
+_ASSET_CACHE: Dict[tuple, SpriteAssets] = {}
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def _to_rgba(surface: pygame.Surface) -> np.ndarray:
+    """Returns the surface as a read-only HxWx4 uint8 array"""
+    # array_alpha is all 255 for surfaces without per-pixel alpha
+    rgb = pygame.surfarray.array3d(surface)
+    alpha = pygame.surfarray.array_alpha(surface)
+    rgba = np.dstack((rgb, alpha)).transpose(1, 0, 2)
+    return _read_only(np.ascontiguousarray(rgba))
+
+
+def _to_hitmask(surface: pygame.Surface) -> np.ndarray:
+    """Returns the alpha hitmask of the surface indexed as [x, y]"""
+    return _read_only(pygame.surfarray.array_alpha(surface) > 0)
+
+
+def _map_sprites(images: dict, fn) -> dict:
+    out = {}
+    for name, value in images.items():
+        if value is None:
+            out[name] = None
+        elif isinstance(value, (tuple, list)):
+            out[name] = tuple(fn(img) for img in value)
+        else:
+            out[name] = fn(value)
+    return out
+
+
+def get_assets(
+        bird_color: str = "yellow",
+        pipe_color: str = "green",
+        background: Optional[str] = "day",
+        screen_size: Tuple[int, int] = (288, 512),
+        ) -> SpriteAssets:
+    """
+    Returns the cached sprites for this configuration, decoding the image
+    files only the first time a configuration is requested in this process.
+
+    Callers must treat the returned surfaces and arrays as read-only.
+    """
+    key = (bird_color, pipe_color, background, tuple(screen_size))
+    assets = _ASSET_CACHE.get(key)
+    if assets is None:
+        images = utils.load_images(
+            convert=False,
+            bird_color=bird_color,
+            pipe_color=pipe_color,
+            bg_type=background,
+        )
+        assets = SpriteAssets(images)
+        _ASSET_CACHE[key] = assets
+    return assets
+
+
+def preload_assets(
+        bird_color: str = "yellow",
+        pipe_color: str = "green",
+        background: Optional[str] = "day",
+        screen_size: Tuple[int, int] = (288, 512),
+        render_mode: Optional[str] = None,
+        **kwargs
+        ) -> Optional[SpriteAssets]:
+    """
+    Decodes the sprites in the current process before vec env workers are
+    forked so that they inherit the cache instead of decoding their own copy.
+    Extra env kwargs are accepted and ignored so that a config's env_kwargs
+    can be passed straight through, and nothing is decoded for envs that do
+    not render. Only workers started with fork share the pages; forkserver
+    and spawn workers (SubprocVecEnv's default) still decode their own.
+    """
+    env_config = kwargs.get('env_config', {})
+    if env_config.get('render_mode', render_mode) is None:
+        return None
+    return get_assets(
+        bird_color=env_config.get('bird_color', bird_color),
+        pipe_color=env_config.get('pipe_color', pipe_color),
+        background=env_config.get('background', background),
+        screen_size=env_config.get('screen_size', screen_size),
+    )
+
+
+def clear_asset_cache() -> None:
+    """Drops every cached configuration"""
+    _ASSET_CACHE.clear()
@@ -1,12 +1,133 @@
 """Custom gymnasium env that inherits from FlappyBirdEnv"""
 
+from functools import lru_cache
+import inspect
 from typing import Dict, Tuple
 import numpy as np
 # import gymnasium as gym
 from numpy import ndarray
 from flappy_bird_gymnasium import FlappyBirdEnv
+from flappy_bird_gymnasium.envs import utils
+from flappy_bird_gymnasium.envs.constants import (
+    PIPE_HEIGHT,
+    PIPE_WIDTH,
+    PLAYER_HEIGHT,
+    PLAYER_WIDTH,
+)
 from flappy_bird_gymnasium.envs.flappy_bird_env import Actions
 import pygame
+from .assets import get_assets
+from .memory import sample_memory, dump_heap_snapshot
+
+# Layout of the flat simulator snapshot returned by get_state():
+# player x, y, vel_y, rot, idx, animation cycle position, loop_iter, score,
+# flapped, ground x, pipe layout index (-1 if unused), pipe layout cursor,
+# the episode's frame skip, then (x, y) of the 3 upper and the 3 lower pipes
+N_PIPES = 3
+_SIM_PIPES = 13
+_SIM_SIZE = _SIM_PIPES + 4 * N_PIPES
+# The 128 bit PCG64 state and increment are split into hi/lo words, followed
+# by has_uint32 and uinteger
+STATE_DTYPE = np.dtype([
+    ('sim', np.float64, (_SIM_SIZE,)),
+    ('rng', np.uint64, (6,)),
+])
+_MASK64 = (1 << 64) - 1
+
+# __init__ arguments that fix the spaces or the screen, which reconfigure()
+# refuses to change, and the groups it re-applies together
+_FIXED_CONFIG = frozenset(('screen_size', 'normalize_obs', 'use_lidar'))
+_RENDER_CONFIG = frozenset(
+    ('render_mode', 'audio_on', 'bird_color', 'pipe_color', 'background'))
+_HARD_STATE_CONFIG = frozenset(
+    ('hard_reset_prob', 'hard_state_lookback', 'hard_state_reservoir'))
+_PIPE_POOL_CONFIG = frozenset(
+    ('pipe_pool_size', 'pipe_pool_length', 'pipe_pool_seed'))
+_FRAME_SKIP_CONFIG = frozenset(('frame_skip', 'render_skipped_frames'))
+
+
+class _FlapCycle:
+    """
+    Drop in for the parent's itertools.cycle([0, 1, 2, 1]) animation index
+    generator that exposes its position so it can be snapshotted
+    """
+    SEQUENCE = (0, 1, 2, 1)
+
+    def __init__(self, pos: int = 0) -> None:
+        self.pos = pos
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        value = self.SEQUENCE[self.pos]
+        self.pos = (self.pos + 1) % len(self.SEQUENCE)
+        return value
+
+
+# Gap offsets the parent FlappyBirdEnv._get_random_pipe draws from
+GAP_YS = (20, 30, 40, 50, 60, 70, 80, 90)
+
+
+@lru_cache(maxsize=None)
+def get_pipe_pool(size: int, length: int, seed: int = 0) -> ndarray:
+    """
+    Returns a read-only (size, length) array of pipe gap offsets drawn from
+    GAP_YS. Row i is the sequence of gaps of pipe layout i; it is the same
+    for every process that asks for the same (size, length, seed).
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.asarray(GAP_YS, dtype=np.int16)[
+        rng.integers(0, len(GAP_YS), size=(size, length))]
+    pool.flags.writeable = False
+    return pool
+
+
+def _as_tuple(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _frame_skip_range(frame_skip) -> Tuple[int, int]:
+    """(low, high) of a frame_skip argument, checking it is valid"""
+    frame_skip = _as_tuple(frame_skip)
+    low, high = frame_skip if isinstance(frame_skip, tuple) and \
+        len(frame_skip) == 2 else (frame_skip, frame_skip)
+    if not isinstance(low, (int, np.integer)) or \
+            not isinstance(high, (int, np.integer)) or not 1 <= low <= high:
+        raise ValueError(
+            f"frame_skip must be >= 1 or a (low, high) range, got "
+            f"{frame_skip}"
+        )
+    return int(low), int(high)
+
+
+def _pack_rng(rng: np.random.Generator) -> list:
+    state = rng.bit_generator.state
+    if state['bit_generator'] != 'PCG64':
+        raise ValueError(
+            f"Can only snapshot PCG64 generators, got {state['bit_generator']}"
+        )
+    return [
+        state['state']['state'] >> 64,
+        state['state']['state'] & _MASK64,
+        state['state']['inc'] >> 64,
+        state['state']['inc'] & _MASK64,
+        state['has_uint32'],
+        state['uinteger'],
+    ]
+
+
+def _unpack_rng(words: ndarray) -> dict:
+    words = [int(w) for w in words]
+    return {
+        'bit_generator': 'PCG64',
+        'state': {
+            'state': (words[0] << 64) | words[1],
+            'inc': (words[2] << 64) | words[3],
+        },
+        'has_uint32': words[4],
+        'uinteger': words[5],
+    }
 
 
 class CustomFlappyBirdEnv(FlappyBirdEnv):
@@ -29,11 +150,44 @@ class CustomFlappyBirdEnv(FlappyBirdEnv):
             render_mode: str | None = None,
             background: str | None = "day",
             score_limit: int | None = None,
-            debug: bool = False
+            debug: bool = False,
+            hard_reset_prob: float = 0.0,
+            hard_state_lookback: int = 20,
+            hard_state_reservoir=None,
+            pipe_pool_size: int | None = None,
+            pipe_pool_length: int = 512,
+            pipe_pool_seed: int = 0,
+            frame_skip: int | Tuple[int, int] = 1,
+            render_skipped_frames: bool = False,
             ) -> None:
         """
         env_config dict may be used to overwrite arguments.
         use_lidar has its default changed to False.
+
+        hard_reset_prob is the fraction of resets that restart from a state
+        harvested hard_state_lookback steps before an earlier crash. States
+        are kept in hard_state_reservoir, a gym_env.hard_states
+        HardStateReservoir that may be shared between envs; a private one is
+        made if none is given. Harvesting runs whenever a reservoir is set.
+
+        pipe_pool_size enables a pool of that many pregenerated pipe layouts
+        (see get_pipe_pool). Each reset picks a layout with the env's RNG, or
+        the one given as reset(options={'pipe_layout': i}), and pipes are
+        spawned from it by index, wrapping after pipe_pool_length pipes.
+
+        frame_skip repeats each action for that many frames inside step(),
+        summing the rewards and stopping early at the end of the episode. A
+        (low, high) pair draws a new skip in that inclusive range every
+        episode. info['frames'] holds the frames a step actually ran. With
+        render_skipped_frames and render_mode='rgb_array', render() returns
+        a list of the frames skipped in the last step followed by the
+        current one, so videos stay smooth, and a plain array when no frame
+        was skipped. Only the last step's frames are kept, and
+        set_skipped_frame_capture(False) stops rendering them while nothing
+        is recording.
+
+        Everything except screen_size, normalize_obs and use_lidar can be
+        changed later with reconfigure().
         """
 
         # This enables env_configs passed through
@@ -49,6 +203,19 @@ class CustomFlappyBirdEnv(FlappyBirdEnv):
         background = env_config.get('background', background)
         score_limit = env_config.get('score_limit', score_limit)
         debug = env_config.get('debug', debug)
+        hard_reset_prob = env_config.get('hard_reset_prob', hard_reset_prob)
+        hard_state_lookback = env_config.get(
+            'hard_state_lookback', hard_state_lookback)
+        hard_state_reservoir = env_config.get(
+            'hard_state_reservoir', hard_state_reservoir)
+        pipe_pool_size = env_config.get('pipe_pool_size', pipe_pool_size)
+        pipe_pool_length = env_config.get('pipe_pool_length', pipe_pool_length)
+        pipe_pool_seed = env_config.get('pipe_pool_seed', pipe_pool_seed)
+        frame_skip = env_config.get('frame_skip', frame_skip)
+        render_skipped_frames = env_config.get(
+            'render_skipped_frames', render_skipped_frames)
+        # render_mode is withheld from the parent so it does not decode its
+        # own copy of every sprite, see _init_render
         super().__init__(
             screen_size,
             audio_on,
@@ -57,18 +224,224 @@ class CustomFlappyBirdEnv(FlappyBirdEnv):
             pipe_gap,
             bird_color,
             pipe_color,
-            render_mode,
+            None,
             background,
             score_limit,
             debug
         )
+        self._player_idx_gen = _FlapCycle()
+        self._hard_states = None
+        # ring of the sim lists of the last hard_state_lookback steps, only
+        # turned into arrays for the rare state that gets harvested
+        self._recent_states = None
+        self._recent_count = 0
+        # (slot, age) in the reservoir this episode was restarted from
+        self._hard_start = None
+        self._hard_steps = 0
+        self._pipe_pool = None
+        self._pipe_layout = -1
+        self._pipe_cursor = 0
+        self._requested_layout = None
+        self._episode_frame_skip = 1
+        self._skipped_frames = []
+        self._capture_skipped_frames = True
+
+        # The effective __init__ arguments, kept current by reconfigure()
+        self._env_config = {
+            'screen_size': tuple(screen_size),
+            'audio_on': audio_on,
+            'normalize_obs': normalize_obs,
+            'use_lidar': use_lidar,
+            'pipe_gap': pipe_gap,
+            'bird_color': bird_color,
+            'pipe_color': pipe_color,
+            'render_mode': render_mode,
+            'background': background,
+            'score_limit': score_limit,
+            'debug': debug,
+            'hard_reset_prob': hard_reset_prob,
+            'hard_state_lookback': hard_state_lookback,
+            'hard_state_reservoir': hard_state_reservoir,
+            'pipe_pool_size': pipe_pool_size,
+            'pipe_pool_length': pipe_pool_length,
+            'pipe_pool_seed': pipe_pool_seed,
+            'frame_skip': _as_tuple(frame_skip),
+            'render_skipped_frames': render_skipped_frames,
+        }
+        self._pending_config = {}
+        self._configure(**self._env_config)
+
+    def _check_config(self, config: Dict) -> None:
+        """Raises a ValueError for values _configure cannot apply"""
+        _frame_skip_range(config['frame_skip'])
+        render_mode = config['render_mode']
+        if render_mode is not None and \
+                render_mode not in self.metadata["render_modes"]:
+            raise ValueError(
+                f"render_mode must be None or one of "
+                f"{self.metadata['render_modes']}, got {render_mode!r}"
+            )
+        if not 0 <= config['hard_reset_prob'] <= 1:
+            raise ValueError(
+                f"hard_reset_prob must be in [0, 1], got "
+                f"{config['hard_reset_prob']}"
+            )
+        if config['hard_state_lookback'] < 1:
+            raise ValueError(
+                f"hard_state_lookback must be >= 1, got "
+                f"{config['hard_state_lookback']}"
+            )
+
+    def _configure(self, **env_config) -> None:
+        """
+        Applies the __init__ arguments that may change between episodes.
+        The merged config is checked first, so a bad value changes nothing.
+        """
+        config = {**self._env_config, **env_config}
+        self._check_config(config)
+        self._env_config = config
+        self._pipe_gap = config['pipe_gap']
+        self._score_limit = config['score_limit']
+        self._debug = config['debug']
+        self._audio_on = config['audio_on']
+
+        if _RENDER_CONFIG & env_config.keys():
+            self._bird_color = config['bird_color']
+            self._pipe_color = config['pipe_color']
+            self._bg_type = config['background']
+            self._init_render(config['render_mode'])
+
+        if _HARD_STATE_CONFIG & env_config.keys():
+            # keep a private reservoir made earlier unless one is passed in
+            reservoir = env_config.get(
+                'hard_state_reservoir', self._hard_states)
+            if config['hard_reset_prob'] > 0 and reservoir is None:
+                from .hard_states import HardStateReservoir
+                reservoir = HardStateReservoir()
+            self._hard_reset_prob = config['hard_reset_prob']
+            self._hard_states = reservoir
+            lookback = config['hard_state_lookback']
+            if self._recent_states is None or \
+                    len(self._recent_states) != lookback:
+                self._recent_states = [None] * lookback
+                self._recent_count = 0
+
+        if _PIPE_POOL_CONFIG & env_config.keys():
+            self._pipe_pool = None
+            if config['pipe_pool_size']:
+                self._pipe_pool = get_pipe_pool(
+                    config['pipe_pool_size'],
+                    config['pipe_pool_length'],
+                    config['pipe_pool_seed'],
+                )
+
+        if _FRAME_SKIP_CONFIG & env_config.keys():
+            self._frame_skip_range = _frame_skip_range(config['frame_skip'])
+            self._render_skipped_frames = config['render_skipped_frames']
+
+    def reconfigure(self, **env_config) -> None:
+        """
+        Changes __init__ arguments of a running env. They take effect at the
+        next reset, so an episode never mixes two configurations, but are
+        checked right away and raise a ValueError if invalid. On a vec
+        env, call it on every worker with
+        vec_env.env_method('reconfigure', pipe_gap=120)
+        """
+        valid = inspect.signature(CustomFlappyBirdEnv.__init__).parameters
+        unknown = [
+            key for key in env_config
+            if key not in valid or key in ('self', 'env_config')
+        ]
+        if unknown:
+            raise ValueError(f"Unknown env arguments: {unknown}")
+        fixed = [
+            key for key in _FIXED_CONFIG & env_config.keys()
+            if _as_tuple(env_config[key]) != self._env_config[key]
+        ]
+        if fixed:
+            raise ValueError(
+                f"{fixed} cannot change after the env is created since they "
+                "define the observation space and screen"
+            )
+        # checked now rather than at the next reset, which on a vec env is
+        # an auto-reset in the middle of training
+        self._check_config(
+            {**self._env_config, **self._pending_config, **env_config})
+        self._pending_config.update(env_config)
+
+    def get_config(self) -> Dict:
+        """
+        Returns the __init__ arguments in effect, plus any reconfigure()
+        waiting for the next reset. A hard_state_reservoir is described by a
+        string, so the result stays cheap to send back from vec env workers
+        (a shared reservoir cannot be pickled there at all).
+        """
+        config = {**self._env_config, **self._pending_config}
+        reservoir = config['hard_state_reservoir']
+        if reservoir is not None:
+            config['hard_state_reservoir'] = (
+                f'{type(reservoir).__name__}(capacity={reservoir.capacity}, '
+                f'shared={reservoir.shared})'
+            )
+        return config
+
+    def memory_stats(self, top_n: int = 0, trace: bool = False) -> Dict:
+        """
+        Memory of the process running this env, see gym_env.memory. On a vec
+        env, vec_env.env_method('memory_stats') samples every worker.
+        """
+        return sample_memory(top_n, trace)
+
+    def dump_heap_snapshot(self, path: str) -> str | None:
+        """tracemalloc snapshot of the process running this env"""
+        return dump_heap_snapshot(path)
+
+    def _init_render(self, render_mode: str | None) -> None:
+        """
+        Mirrors the render setup of the parent __init__, but takes the
+        sprites from the process-wide cache in gym_env.assets
+        """
+        assert render_mode is None or \
+            render_mode in self.metadata["render_modes"]
+        self.render_mode = render_mode
+        if render_mode is not None:
+            screen_size = (self._screen_width, self._screen_height)
+            self._fps_clock = pygame.time.Clock()
+            self._display = None
+            self._surface = pygame.Surface(screen_size)
+            # Shallow copy: _make_display swaps in converted surfaces for
+            # human mode and must not write them back into the cache
+            self._images = dict(get_assets(
+                bird_color=self._bird_color,
+                pipe_color=self._pipe_color,
+                background=self._bg_type,
+                screen_size=screen_size,
+            ).images)
+            if self._audio_on:
+                self._sounds = utils.load_sounds()
 
     def step(
             self,
             action: Actions | int
             ) -> Tuple[ndarray | float | bool | Dict]:
 
-        obs, reward, terminal, truncated, info = super().step(action)
+        capture = self._capture_skipped_frames and \
+            self._render_skipped_frames and self.render_mode == "rgb_array"
+        # Frames of earlier steps nobody rendered are dropped
+        self._skipped_frames = []
+        reward = 0
+        for frame in range(self._episode_frame_skip):
+            if frame > 0 and capture:
+                self._skipped_frames.append(super().render())
+            obs, frame_reward, terminal, truncated, info = \
+                super().step(action)
+            reward += frame_reward
+
+            if self._hard_states is not None:
+                self._track_hard_states(terminal)
+            if terminal or truncated:
+                break
+        info['frames'] = frame + 1
 
         return (
             obs,
@@ -83,12 +456,229 @@ class CustomFlappyBirdEnv(FlappyBirdEnv):
             seed=None,
             options=None
             ) -> Tuple[ndarray | Dict]:
+        if self._pending_config:
+            self._configure(**self._pending_config)
+            self._pending_config = {}
+        # The layout is picked by _get_random_pipe once the parent has
+        # reseeded np_random
+        self._pipe_layout = -1
+        self._requested_layout = (options or {}).get('pipe_layout')
         obs, info = super().reset(seed, options)
 
         # reset your changes to env here as needed
+        if self._hard_states is not None:
+            obs, info = self._hard_reset(obs, info)
+        if self._pipe_pool is not None:
+            info['pipe_layout'] = self._pipe_layout
+        low, high = self._frame_skip_range
+        self._episode_frame_skip = low if low == high else \
+            int(self.np_random.integers(low, high + 1))
+        self._skipped_frames = []
 
         return obs, info
 
+    def set_skipped_frame_capture(self, enabled: bool) -> None:
+        """
+        Turns rendering of skipped frames on or off, e.g. on only while a
+        video wrapper is recording. Has no effect without
+        render_skipped_frames.
+        """
+        self._capture_skipped_frames = enabled
+        if not enabled:
+            self._skipped_frames = []
+
+    def render(self) -> ndarray | list | None:
+        """
+        Renders as the parent does, except that when the last step captured
+        skipped frames (render_skipped_frames) they are returned first in a
+        list. SB3's VecEnv.render/get_images and EvalCallback(render=True)
+        expect a single array, so only use it with frame_skip 1 or with
+        capture switched off there.
+        """
+        if self._skipped_frames:
+            frames, self._skipped_frames = self._skipped_frames, []
+            frames.append(super().render())
+            return frames
+        return super().render()
+
+    def _check_crash(self) -> bool:
+        """
+        Same result as the parent, which builds a pygame.Rect for the player
+        and for every pipe each step, as plain integer overlap tests.
+        Coordinates are truncated toward zero like pygame.Rect does with the
+        float pipe x. In debug lidar mode the parent runs for its prints.
+        """
+        if self._debug and self._use_lidar:
+            return super()._check_crash()
+        player_y = self._player_y
+        if player_y + PLAYER_HEIGHT >= self._ground["y"] - 1:
+            return True
+        left = int(self._player_x)
+        right = left + PLAYER_WIDTH
+        top = int(player_y)
+        bottom = top + PLAYER_HEIGHT
+        for pipes in (self._upper_pipes, self._lower_pipes):
+            for pipe in pipes:
+                x = int(pipe["x"])
+                if x < right and left < x + PIPE_WIDTH:
+                    y = int(pipe["y"])
+                    if y < bottom and top < y + PIPE_HEIGHT:
+                        return True
+        return False
+
+    def _get_random_pipe(self) -> Dict[str, int]:
+        """Takes the next gap from the episode's pipe layout if pooled"""
+        if self._pipe_pool is None:
+            return super()._get_random_pipe()
+        if self._pipe_layout < 0:
+            layout = self._requested_layout
+            if layout is None:
+                layout = self.np_random.integers(len(self._pipe_pool))
+            self._pipe_layout = int(layout) % len(self._pipe_pool)
+            self._pipe_cursor = 0
+        row = self._pipe_pool[self._pipe_layout]
+        gap_y = int(row[self._pipe_cursor % len(row)])
+        self._pipe_cursor += 1
+        gap_y += int(self._ground["y"] * 0.2)
+
+        pipe_x = self._screen_width + PIPE_WIDTH + (self._screen_width * 0.2)
+        return [
+            {"x": pipe_x, "y": gap_y - PIPE_HEIGHT},  # upper pipe
+            {"x": pipe_x, "y": gap_y + self._pipe_gap},  # lower pipe
+        ]
+
+    def _hard_reset(self, obs: ndarray, info: Dict) -> Tuple[ndarray | Dict]:
+        """Maybe swaps the fresh episode for a harvested pre-death state"""
+        self._hard_start = None
+        self._hard_steps = 0
+        info['hard_start'] = False
+        if self._hard_reset_prob > 0 and \
+                self.np_random.random() < self._hard_reset_prob:
+            sample = self._hard_states.sample(self.np_random)
+            if sample is not None:
+                slot, age, state = sample
+                # keep the current RNG so upcoming pipes differ each restart
+                obs = self.set_state(state, restore_rng=False)
+                self._score = 0
+                info['score'] = self._score
+                info['hard_start'] = True
+                self._hard_start = (slot, age)
+        self._recent_count = 0
+        self._record_recent_state()
+        return obs, info
+
+    def _record_recent_state(self) -> None:
+        recent = self._recent_states
+        recent[self._recent_count % len(recent)] = self._sim_values()
+        self._recent_count += 1
+
+    def _track_hard_states(self, terminal: bool) -> None:
+        """
+        Scores the state this episode restarted from and, on a crash, adds
+        the state from hard_state_lookback steps ago to the reservoir.
+        Only the sim lists are kept each step; building the array and packing
+        the RNG is left to the rare crash, and restarts do not restore the
+        RNG anyway.
+        """
+        lookback = len(self._recent_states)
+        if self._hard_start is not None:
+            self._hard_steps += 1
+            if terminal or self._hard_steps >= lookback:
+                self._hard_states.update(*self._hard_start, died=terminal)
+                self._hard_start = None
+        if terminal:
+            if self._recent_count >= lookback:
+                state = np.zeros((), dtype=STATE_DTYPE)
+                # the oldest entry is the next one to be overwritten
+                state['sim'] = self._recent_states[
+                    self._recent_count % lookback]
+                state['rng'] = _pack_rng(self.np_random)
+                self._hard_states.add(state)
+        else:
+            self._record_recent_state()
+
+    def get_state(self) -> ndarray:
+        """
+        Returns a snapshot of the full simulator state (bird, pipes, score
+        and RNG) as a 0-d structured array of STATE_DTYPE. It is picklable
+        and state.tobytes() gives a flat bytes form for set_state.
+        Only valid after reset() has been called.
+        """
+        state = np.zeros((), dtype=STATE_DTYPE)
+        state['sim'] = self._sim_values()
+        state['rng'] = _pack_rng(self.np_random)
+        return state
+
+    def _sim_values(self) -> list:
+        """The 'sim' field of get_state() as a list"""
+        ground_x = self._ground["x"]
+        sim = [
+            self._player_x,
+            self._player_y,
+            self._player_vel_y,
+            self._player_rot,
+            self._player_idx,
+            self._player_idx_gen.pos,
+            self._loop_iter,
+            self._score,
+            self._player_flapped,
+            ground_x,
+            self._pipe_layout,
+            self._pipe_cursor,
+            self._episode_frame_skip,
+        ]
+        for pipes in (self._upper_pipes, self._lower_pipes):
+            for pipe in pipes:
+                sim.append(pipe["x"])
+                sim.append(pipe["y"])
+        return sim
+
+    def set_state(
+            self,
+            state: ndarray | bytes,
+            restore_rng: bool = True
+            ) -> ndarray:
+        """
+        Restores a snapshot from get_state() and returns the observation for
+        it. With restore_rng=False the pipes spawned from here on differ from
+        the ones that followed the original snapshot.
+        """
+        if isinstance(state, (bytes, bytearray, memoryview)):
+            state = np.frombuffer(state, dtype=STATE_DTYPE).reshape(())
+        if state.dtype != STATE_DTYPE:
+            raise ValueError(
+                f"Expected a snapshot of dtype {STATE_DTYPE}, "
+                f"got {state.dtype}"
+            )
+        if not hasattr(self, '_upper_pipes'):
+            # pipes only exist after the first reset
+            self.reset()
+        sim = state['sim'].tolist()
+        self._player_x = int(sim[0])
+        self._player_y = sim[1]
+        self._player_vel_y = int(sim[2])
+        self._player_rot = int(sim[3])
+        self._player_idx = int(sim[4])
+        self._player_idx_gen.pos = int(sim[5])
+        self._loop_iter = int(sim[6])
+        self._score = int(sim[7])
+        self._player_flapped = bool(sim[8])
+        self._ground["x"] = sim[9]
+        self._pipe_layout = int(sim[10])
+        self._pipe_cursor = int(sim[11])
+        self._episode_frame_skip = int(sim[12])
+        i = _SIM_PIPES
+        for pipes in (self._upper_pipes, self._lower_pipes):
+            for pipe in pipes:
+                pipe["x"] = sim[i]
+                pipe["y"] = sim[i + 1]
+                i += 2
+        if restore_rng:
+            self.np_random.bit_generator.state = _unpack_rng(state['rng'])
+
+        obs, _ = self._get_observation()
+        return obs
+
     # TODO: Write code here that makes it so the score is printed on the
     # screen in videos. HINT: find a parent method to override.
     
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""Bounded reservoir of pre-death states to restart CustomFlappyBirdEnv from"""
+
+from contextlib import nullcontext
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+import numpy as np
+from numpy import ndarray
+from .custom_flappy_env import STATE_DTYPE
+
+_SLOT_DTYPE = np.dtype([
+    ('state', STATE_DTYPE),
+    ('difficulty', np.int64),
+    ('age', np.int64),
+])
+# number of filled slots, insertion clock
+_HEADER_SIZE = 2
+
+
+class HardStateReservoir:
+    """
+    Fixed capacity store of CustomFlappyBirdEnv.get_state() snapshots.
+
+    Every slot carries a difficulty and an age. New states start with
+    difficulty 1; it goes up each time an episode restarted from the state
+    dies again within the env's lookback window and down when it survives.
+    When full, add() evicts the least difficult slot, oldest first, so states
+    the policy has learned to clear are the first to go.
+
+    With shared=True the slots live in multiprocessing shared memory and the
+    reservoir can be handed to SubprocVecEnv workers through env_kwargs, so
+    all workers harvest into and sample from the same pool. start_method must
+    match the one given to SubprocVecEnv and defaults to its default.
+    Otherwise it is a plain in-process object, which is all DummyVecEnv needs.
+    """
+
+    def __init__(
+            self,
+            capacity: int = 1024,
+            shared: bool = False,
+            start_method: Optional[str] = None
+            ) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.shared = shared
+        self._shm = None
+        self._owner = shared
+        if shared:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=self._nbytes(capacity))
+            if start_method is None:
+                forkserver = "forkserver" in \
+                    multiprocessing.get_all_start_methods()
+                start_method = "forkserver" if forkserver else "spawn"
+            self._lock = multiprocessing.get_context(start_method).Lock()
+            self._attach()
+            self._header[:] = 0
+        else:
+            self._lock = nullcontext()
+            self._header = np.zeros(_HEADER_SIZE, dtype=np.int64)
+            self._slots = np.zeros(capacity, dtype=_SLOT_DTYPE)
+
+    @staticmethod
+    def _nbytes(capacity: int) -> int:
+        return _HEADER_SIZE * 8 + capacity * _SLOT_DTYPE.itemsize
+
+    def _attach(self) -> None:
+        buf = self._shm.buf
+        self._header = np.ndarray(
+            (_HEADER_SIZE,), dtype=np.int64, buffer=buf)
+        self._slots = np.ndarray(
+            (self.capacity,), dtype=_SLOT_DTYPE, buffer=buf,
+            offset=_HEADER_SIZE * 8)
+
+    def __getstate__(self) -> dict:
+        if not self.shared:
+            return self.__dict__.copy()
+        # Only the name travels, the worker maps the same block. The lock can
+        # only be pickled while a worker process is being spawned.
+        return {
+            'capacity': self.capacity,
+            'name': self._shm.name,
+            'lock': self._lock,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        if 'name' not in state:
+            self.__dict__.update(state)
+            return
+        self.capacity = state['capacity']
+        self.shared = True
+        self._owner = False
+        self._lock = state['lock']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._attach()
+
+    def __len__(self) -> int:
+        return int(self._header[0])
+
+    def add(self, state: ndarray) -> None:
+        """Stores a snapshot, evicting one if the reservoir is full"""
+        with self._lock:
+            size, clock = self._header
+            if size < self.capacity:
+                slot = size
+                self._header[0] = size + 1
+            else:
+                slots = self._slots
+                slot = np.lexsort((slots['age'], slots['difficulty']))[0]
+            self._header[1] = clock + 1
+            self._slots['state'][slot] = state
+            self._slots['difficulty'][slot] = 1
+            self._slots['age'][slot] = clock + 1
+
+    def sample(
+            self,
+            rng: np.random.Generator
+            ) -> Optional[Tuple[int, int, ndarray]]:
+        """
+        Returns (slot, age, state) of a uniformly drawn snapshot, or None if
+        the reservoir is empty. Pass slot and age back to update().
+        """
+        with self._lock:
+            size = int(self._header[0])
+            if size == 0:
+                return None
+            slot = int(rng.integers(size))
+            record = self._slots[slot:slot + 1].copy()
+        return slot, int(record['age'][0]), record['state'].reshape(())
+
+    def update(self, slot: int, age: int, died: bool) -> None:
+        """
+        Adjusts the difficulty of a sampled slot, unless it was evicted and
+        refilled since it was sampled
+        """
+        with self._lock:
+            if self._slots['age'][slot] != age:
+                return
+            difficulty = self._slots['difficulty']
+            if died:
+                difficulty[slot] += 1
+            elif difficulty[slot] > 0:
+                difficulty[slot] -= 1
+
+    def close(self) -> None:
+        """Releases the shared memory block, freeing it if this is the owner"""
+        if self._shm is None:
+            return
+        self._header = None
+        self._slots = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
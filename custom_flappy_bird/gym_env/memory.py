@@ -0,0 +1,60 @@
+"""
+Memory sampling for the learner and for vec env worker processes, which
+reach it through CustomFlappyBirdEnv.memory_stats() via env_method.
+"""
+
+import os
+import tracemalloc
+from typing import Dict, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_MB = 1024 ** 2
+
+
+def rss_mb(pid: Optional[int] = None) -> float:
+    """Resident set size of a process, this one by default, in MB"""
+    pid = pid or os.getpid()
+    if psutil is not None:
+        return psutil.Process(pid).memory_info().rss / _MB
+    # Linux without psutil, second field of statm is resident pages
+    with open(f'/proc/{pid}/statm') as fp:
+        pages = int(fp.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / _MB
+
+
+def sample_memory(top_n: int = 0, trace: bool = False) -> Dict:
+    """
+    RSS of this process and, when tracemalloc is tracing, the traced size,
+    its peak and the top_n lines that allocated the most. Tracing is started
+    on the first call with top_n > 0 or trace, so only allocations made
+    after that show up (and in dump_heap_snapshot).
+    """
+    stats = {'pid': os.getpid(), 'rss_mb': rss_mb()}
+    if (top_n > 0 or trace) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats['traced_mb'] = current / _MB
+        stats['traced_peak_mb'] = peak / _MB
+        if top_n > 0:
+            top = tracemalloc.take_snapshot().statistics('lineno')[:top_n]
+            stats['top'] = [
+                (str(stat.traceback), stat.size / _MB) for stat in top
+            ]
+    return stats
+
+
+def dump_heap_snapshot(path: os.PathLike) -> Optional[str]:
+    """
+    Writes a tracemalloc snapshot of this process, to load later with
+    tracemalloc.Snapshot.load. Returns the path, or None if not tracing.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tracemalloc.take_snapshot().dump(str(path))
+    return str(path)
@@ -1,62 +1,150 @@
 """
-Script to demo two episodes of the parent gym env
-FYI this file cannot see modules in ../ for importing when run as a 'script'
-(press play button in vscode).
-Pylint will say you can import them,
- but you would have to run this as a 'module'
+Renders episodes of the parent gym env to GIF/MP4, spread over a pool of
+worker processes. Each worker streams its frames to the video file, so
+memory stays flat however long an episode runs.
 
-I.e. if you add:
-import custom_flappy_bird
-
-This works:
+FYI this file imports custom_flappy_bird, so it has to be run as a
+'module' from the repo root, not as a 'script' (play button in vscode):
     python -m custom_flappy_bird.scripts.demo
+    python -m custom_flappy_bird.scripts.demo --episodes 32 --workers 8 \\
+        --policy flap:0.05 --format mp4 --stride 2 --downscale 2
+    python -m custom_flappy_bird.scripts.demo \\
+        --policy ./models/PPO_20250225-210152/best_model.npz
 This does NOT work:
     python ./custom_flappy_bird/scripts/demo.py
+
+--policy takes one or more of 'random', 'flap:P' to flap with probability
+P, or a policy exported by custom_flappy_bird.utils.numpy_policy.export_policy
+(no torch needed), used in turn by the episodes. By default the first
+episode is random and the second flaps 5% of the time.
 """
 
+import argparse
+import multiprocessing
+import os
+import time
 import numpy as np
 import flappy_bird_gymnasium  # noqa: F401
 import gymnasium
-import imageio
-# import custom_flappy_bird
-
-# This is loading the gym environment from the pip library,
-# not the custom one in this repo.
-env = gymnasium.make("FlappyBird-v0", render_mode="rgb_array")
-
-obs, _ = env.reset()
-images = []
-while True:
-    # Random action from action space:
-    action = env.action_space.sample()
-    obs, reward, terminated, _, info = env.step(action)
-    # if terminated: env.set_color('red')
-    images.append(env.render())
-
-    # Checking if the player is still alive
-    if terminated:
-        print('terminated')
-        break
-
-imageio.mimsave('./flappy1.gif', images)
-
-obs, _ = env.reset()
-# env.set_color(None)
-images = []
-while True:
-    # Flap just 5% of the time
-    action = np.random.choice([0, 1], p=[0.95, 0.05])
-    # Processing:
-    obs, reward, terminated, _, info = env.step(action)
-    # if terminated: env.set_color('red')
-    images.append(env.render())
-
-    # Checking if the player is still alive
-    if terminated:
-        print('terminated')
-        break
-
-imageio.mimsave('./flappy2.gif', images)
-
-
-env.close()
+from custom_flappy_bird.utils.video import get_video_writer
+
+# Set in each worker by _init_worker
+_worker = {}
+
+
+def _init_worker(args: argparse.Namespace) -> None:
+    policies = {}
+    for spec in args.policy:
+        if spec.endswith('.npz'):
+            from custom_flappy_bird.utils.numpy_policy import NumpyPolicy
+            policies[spec] = NumpyPolicy.load(spec)
+    # This is loading the gym environment from the pip library,
+    # not the custom one in this repo.
+    # Our custom env turns off lidar, so a trained policy needs it off too.
+    _worker['env'] = gymnasium.make(
+        "FlappyBird-v0",
+        render_mode="rgb_array",
+        use_lidar=not policies,
+    )
+    _worker['policies'] = policies
+    _worker['args'] = args
+
+
+def _run_episode(episode: int) -> dict:
+    env, args = _worker['env'], _worker['args']
+    spec = args.policy[episode % len(args.policy)]
+    policy = _worker['policies'].get(spec)
+    rng = np.random.default_rng(args.seed + episode)
+    flap_prob = float(spec.split(':')[1]) if spec.startswith('flap:') \
+        else None
+    path = os.path.join(args.out, f'flappy{episode + 1}.{args.format}')
+    writer = get_video_writer(path, fps=args.fps / args.stride)
+
+    start = time.perf_counter()
+    obs, _ = env.reset(seed=args.seed + episode)
+    steps = frames = 0
+    total_reward = 0.0
+    done = False
+    while not done and steps != args.max_steps:
+        if policy is not None:
+            action, _ = policy.predict(obs, deterministic=True)
+        elif flap_prob is not None:
+            action = int(rng.random() < flap_prob)
+        else:
+            action = int(rng.integers(2))
+        obs, reward, terminated, truncated, info = env.step(action)
+        total_reward += reward
+        steps += 1
+        done = terminated or truncated
+        if (steps - 1) % args.stride == 0:
+            frame = env.render()
+            writer.append_data(frame[::args.downscale, ::args.downscale])
+            frames += 1
+    writer.close()
+    return {
+        'episode': episode,
+        'path': path,
+        'steps': steps,
+        'frames': frames,
+        'reward': total_reward,
+        'score': info.get('score', 0),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--episodes', type=int, default=2,
+                        help='number of episodes to render')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes')
+    parser.add_argument('--policy', nargs='+',
+                        default=['random', 'flap:0.05'],
+                        help="'random', 'flap:P' or a path to a policy .npz, "
+                             "several are used in turn")
+    parser.add_argument('--format', choices=['gif', 'mp4'], default='gif')
+    parser.add_argument('--stride', type=int, default=1,
+                        help='keep every stride-th frame')
+    parser.add_argument('--downscale', type=int, default=1,
+                        help='keep every downscale-th pixel in x and y')
+    parser.add_argument('--fps', type=float, default=30,
+                        help='frame rate of the game, before stride')
+    parser.add_argument('--max-steps', type=int, default=-1,
+                        help='cut episodes after this many steps')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='episode i is played with seed + i')
+    parser.add_argument('--out', default='.', help='output folder')
+    args = parser.parse_args(argv)
+    for spec in args.policy:
+        if spec != 'random' and not spec.startswith('flap:') \
+                and not spec.endswith('.npz'):
+            parser.error(f"unknown policy {spec}")
+    if args.stride < 1 or args.downscale < 1:
+        parser.error("stride and downscale must be at least 1")
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    os.makedirs(args.out, exist_ok=True)
+    workers = max(1, min(args.workers, args.episodes))
+
+    start = time.perf_counter()
+    results = []
+    with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(args,)) as pool:
+        for result in pool.imap_unordered(_run_episode, range(args.episodes)):
+            results.append(result)
+            print(f"{result['path']}: {result['steps']} steps, score "
+                  f"{result['score']}, {result['seconds']:.1f}s")
+    elapsed = time.perf_counter() - start
+
+    steps = sum(result['steps'] for result in results)
+    frames = sum(result['frames'] for result in results)
+    print(f"{len(results)} episodes with {workers} workers in "
+          f"{elapsed:.1f}s: {len(results) / elapsed:.2f} episodes/s, "
+          f"{steps / elapsed:.0f} steps/s, {frames / elapsed:.0f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
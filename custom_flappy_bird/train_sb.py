@@ -9,10 +9,16 @@ import os
 from stable_baselines3 import PPO
 from stable_baselines3.common.env_util import make_vec_env
 from gymnasium.envs.registration import register
+from gym_env.assets import preload_assets
+from gym_env.hard_states import HardStateReservoir
 from utils.utils import get_time_str, save_config
+from utils.trace import RecordTrace
 from utils.sb3_callbacks import (  # noqa: F401
     FlapActionMetricCallback,
     CustomScoreCallback,
+    EnvScheduleCallback,
+    MetricsSinkCallback,
+    MemoryMonitorCallback,
     # TBBestVideosCallback,
     # TBVideoRecorderCallback
 )
@@ -24,6 +30,8 @@ tensorboard_log = \
     pathlib.Path(__file__).parent.parent.resolve().joinpath('tblogs')
 models_dir = pathlib.Path(__file__).parent.parent.resolve().joinpath('models')
 alg_name = 'PPO'  # just as a reminder later in config json
+# Record every training step under the model folder (see utils/trace.py)
+record_trace = False
 
 timestamp = get_time_str()
 model_folder = os.path.join(models_dir, f'{alg_name}_{timestamp}')
@@ -34,7 +42,9 @@ model_folder = os.path.join(models_dir, f'{alg_name}_{timestamp}')
 config = {
     'alg_name': alg_name,
     'env_kwargs': {
-        'render_mode': 'rgb_array'
+        'render_mode': 'rgb_array',
+        # fraction of resets restarted from states just before a crash
+        'hard_reset_prob': 0.0,
     },
     'learning_rate': 2.5e-5,
 }
@@ -50,12 +60,25 @@ register(
      entry_point="gym_env.custom_flappy_env:CustomFlappyBirdEnv",
 )
 
+# One reservoir of pre-death states shared by all the training envs. It is
+# added after save_config since it does not belong in the json.
+# Use shared=True if switching to vec_env_cls=SubprocVecEnv.
+env_kwargs = dict(config['env_kwargs'])
+if env_kwargs.get('hard_reset_prob', 0) > 0:
+    env_kwargs['hard_state_reservoir'] = HardStateReservoir(capacity=4096)
+
+# Decode the sprites once here, before any env or forked worker needs them
+preload_assets(**env_kwargs)
+
 # Parallel environments
 vec_env = make_vec_env(
     "CustomFlappyBirdEnv",
     n_envs=num_cpu,
-    env_kwargs=config['env_kwargs'],
-    monitor_dir=os.path.join(model_folder, 'monitor')
+    env_kwargs=env_kwargs,
+    monitor_dir=os.path.join(model_folder, 'monitor'),
+    wrapper_class=RecordTrace if record_trace else None,
+    wrapper_kwargs={'trace_folder': os.path.join(model_folder, 'traces')}
+    if record_trace else None,
 )
 
 eval_env = make_vec_env(
@@ -81,8 +104,27 @@ alg.learn(
     progress_bar=True,
     tb_log_name=f'{alg_name}_{timestamp}',
     callback=[
+        # Pass it to callbacks logging many per-step metrics, they record()
+        # into it instead of self.logger
+        MetricsSinkCallback(),
+        # RSS of the learner and every env under mem/, warns well before the
+        # 32 GB container limit. Heap snapshots are only dumped with
+        # trace_allocations=True, which runs tracemalloc everywhere and
+        # makes training about twice as slow, so turn it on to hunt a leak.
+        MemoryMonitorCallback(
+            sample_freq=10000,
+            trace_allocations=False,
+            soft_limit_mb=24000,
+        ),
         FlapActionMetricCallback(),
         CustomScoreCallback(),
+        # Example curriculum, widening the pipe gap early in training
+        # EnvScheduleCallback(
+        #     schedule={0: {'pipe_gap': 150}, 2e6: {'pipe_gap': 100}},
+        #     config=config,
+        #     timestamp=timestamp,
+        #     folder=model_folder,
+        # ),
         EvalCallback(
             eval_env=eval_env,
             # callback_on_new_best=TBBestVideosCallback(
@@ -122,3 +164,7 @@ alg.save(os.path.join(model_folder, 'model.zip'))
 #     action, _states = alg.predict(obs)
 #     obs, rewards, dones, info = vec_env.step(action)
 #     vec_env.render()
+
+# Flushes and truncates the trace files of RecordTrace, and stops workers
+vec_env.close()
+eval_env.close()
@@ -0,0 +1,292 @@
+"""
+Local policy server that batches observations from many env worker
+processes into one forward pass, so workers step asynchronously without
+each loading a copy of the model.
+
+Workers talk to the server over a Unix socket. A request is a uint32 count
+of observations followed by them as float32. The reply starts with a uint32
+error length: 0 is followed by that many int64 actions, anything else by
+the error message of a failed predict as utf-8. The server answers a batch
+once it has max_batch_size observations or its oldest request has waited
+max_latency_ms.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from numpy import ndarray
+import gymnasium as gym
+
+_HEADER = struct.Struct('<I')
+
+
+class PolicyServer:
+    """
+    Serves policy.predict() (e.g. a NumpyPolicy) on a Unix socket from a
+    background thread running an asyncio loop. Use as a context manager or
+    call start() and stop().
+    """
+
+    def __init__(
+            self,
+            policy,
+            obs_shape: Tuple[int],
+            socket_path: Optional[str] = None,
+            max_batch_size: int = 256,
+            max_latency_ms: float = 2.0,
+            deterministic: bool = True
+            ):
+        """
+        :param policy: object with an sb3 style predict(obs, deterministic)
+        :param obs_shape: shape of a single observation
+        :param socket_path: where to listen, a fresh temp path by default
+        :param max_batch_size: most observations per forward pass
+        :param max_latency_ms: longest a request waits for a batch to fill
+        :param deterministic: passed on to policy.predict
+        """
+        self.policy = policy
+        self.obs_shape = tuple(obs_shape)
+        self.obs_size = int(np.prod(obs_shape))
+        self.socket_path = socket_path or os.path.join(
+            tempfile.gettempdir(),
+            f'flappy-policy-{os.getpid()}-{id(self)}.sock')
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.deterministic = deterministic
+        # batch sizes served, for tuning max_latency_ms
+        self.batch_sizes: List[int] = []
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self) -> 'PolicyServer':
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self) -> 'PolicyServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        self._ready.set()
+        await self._stop.wait()
+        batcher.cancel()
+        server.close()
+        await server.wait_closed()
+        os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader, writer) -> None:
+        try:
+            while True:
+                (n_obs,) = _HEADER.unpack(
+                    await reader.readexactly(_HEADER.size))
+                data = await reader.readexactly(n_obs * self.obs_size * 4)
+                obs = np.frombuffer(data, dtype=np.float32).reshape(
+                    (n_obs,) + self.obs_shape)
+                future = self._loop.create_future()
+                await self._queue.put((obs, future))
+                try:
+                    actions = await future
+                except Exception as e:
+                    message = f'{type(e).__name__}: {e}'.encode()
+                    writer.write(_HEADER.pack(len(message)) + message)
+                else:
+                    writer.write(_HEADER.pack(0)
+                                 + actions.astype(np.int64).tobytes())
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            # worker closed the connection
+            pass
+        finally:
+            writer.close()
+
+    async def _batch_loop(self) -> None:
+        while True:
+            requests = [await self._queue.get()]
+            n_obs = len(requests[0][0])
+            deadline = self._loop.time() + self.max_latency
+            while n_obs < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(
+                        self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                n_obs += len(request[0])
+
+            batch = np.concatenate([obs for obs, _ in requests])
+            try:
+                actions, _ = self.policy.predict(
+                    batch, deterministic=self.deterministic)
+            except Exception as e:
+                # Fail these requests, keep serving the next ones
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            self.batch_sizes.append(len(batch))
+            start = 0
+            for obs, future in requests:
+                future.set_result(actions[start:start + len(obs)])
+                start += len(obs)
+
+
+class PolicyClient:
+    """
+    Blocking client for a PolicyServer. predict() follows the sb3 signature
+    so it can be dropped into evaluation loops in place of a model.
+    """
+
+    def __init__(self, socket_path: str, obs_shape: Tuple[int]):
+        self.obs_shape = tuple(obs_shape)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+
+    def predict(
+            self,
+            observation: ndarray,
+            state=None,
+            episode_start=None,
+            deterministic: bool = True
+            ) -> Tuple[ndarray, None]:
+        """deterministic is decided by the server and ignored here"""
+        obs = np.asarray(observation, dtype=np.float32)
+        single = obs.shape == self.obs_shape
+        if single:
+            obs = obs[None]
+        self._sock.sendall(_HEADER.pack(len(obs)) + obs.tobytes())
+        (error_length,) = _HEADER.unpack(self._recv(_HEADER.size))
+        if error_length:
+            message = self._recv(error_length).decode()
+            raise RuntimeError(f"Policy server failed to predict: {message}")
+        actions = np.frombuffer(self._recv(len(obs) * 8), dtype=np.int64)
+        if single:
+            actions = actions[0]
+        return actions, None
+
+    def _recv(self, nbytes: int) -> bytes:
+        data = bytearray()
+        while len(data) < nbytes:
+            chunk = self._sock.recv(nbytes - len(data))
+            if not chunk:
+                raise ConnectionError("Policy server closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+def rollout_worker(
+        env_id: str,
+        env_kwargs: dict,
+        socket_path: str,
+        seeds: Sequence[int],
+        wrappers: Sequence[Callable[[gym.Env], gym.Env]] = ()
+        ) -> List[Tuple[float, int, int]]:
+    """
+    Plays one episode per seed, asking the server for every action.
+    Returns (reward, score, length) per episode.
+    """
+    env = gym.make(env_id, **env_kwargs)
+    for wrapper in wrappers:
+        env = wrapper(env)
+    client = PolicyClient(socket_path, env.observation_space.shape)
+    results = []
+    for seed in seeds:
+        obs, info = env.reset(seed=seed)
+        episode_reward = 0.0
+        length = 0
+        done = False
+        while not done:
+            action, _ = client.predict(obs)
+            obs, reward, terminated, truncated, info = env.step(int(action))
+            episode_reward += reward
+            length += 1
+            done = terminated or truncated
+        results.append((episode_reward, info.get('score', 0), length))
+    client.close()
+    env.close()
+    return results
+
+
+def evaluate_with_server(
+        policy,
+        env_id: str,
+        n_workers: int,
+        n_eval_episodes: int,
+        env_kwargs: Optional[dict] = None,
+        seed: int = 0,
+        wrappers: Sequence[Callable[[gym.Env], gym.Env]] = (),
+        max_latency_ms: float = 2.0,
+        deterministic: bool = True,
+        start_method: str = 'fork'
+        ) -> List[Tuple[float, int, int]]:
+    """
+    Evaluates policy on episode seeds seed .. seed + n_eval_episodes - 1
+    spread over n_workers processes that share one PolicyServer.
+    env_id must be registered in the workers, which the default 'fork'
+    start method takes care of. The workers are forked before the server
+    thread starts, so they inherit neither its socket nor its event loop.
+    wrappers must be picklable (e.g. partial).
+    Returns (reward, score, length) per episode in seed order.
+    """
+    env_kwargs = env_kwargs or {}
+    obs_shape = getattr(policy, 'obs_shape', None)
+    if obs_shape is None:
+        env = gym.make(env_id, **env_kwargs)
+        obs_shape = env.observation_space.shape
+        env.close()
+    seeds = [seed + episode for episode in range(n_eval_episodes)]
+    ctx = multiprocessing.get_context(start_method)
+    with ctx.Pool(n_workers) as pool, PolicyServer(
+            policy,
+            obs_shape,
+            max_batch_size=n_workers,
+            max_latency_ms=max_latency_ms,
+            deterministic=deterministic) as server:
+        start = time.perf_counter()
+        chunks = pool.starmap(rollout_worker, [
+            (env_id, env_kwargs, server.socket_path,
+             seeds[i::n_workers], wrappers)
+            for i in range(n_workers)
+        ])
+        elapsed = time.perf_counter() - start
+        sizes = server.batch_sizes
+    steps = sum(length for chunk in chunks for _, _, length in chunk)
+    print(f'{steps} steps in {elapsed:.1f}s ({steps / elapsed:.0f} steps/s), '
+          f'mean batch size {np.mean(sizes):.1f}')
+    results = [None] * n_eval_episodes
+    for i, chunk in enumerate(chunks):
+        results[i::n_workers] = chunk
+    return results
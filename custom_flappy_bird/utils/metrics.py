@@ -0,0 +1,131 @@
+"""
+Metrics sink that keeps TensorBoard writes off the training thread.
+
+record() only stores the value in a fixed size ring buffer for its key. A
+background thread wakes every flush_interval seconds, reduces what arrived
+since the last flush to mean/min/max/count and writes those as scalars.
+"""
+
+import threading
+from typing import Dict, Optional
+import numpy as np
+
+try:
+    from torch.utils.tensorboard import SummaryWriter
+except ImportError:
+    SummaryWriter = None
+
+
+class _Ring:
+    """
+    Single producer, single consumer ring of floats. The producer only
+    moves head and the consumer only moves tail, so no lock is needed; when
+    the producer laps the consumer the oldest values are dropped.
+    """
+
+    def __init__(self, capacity: int):
+        self.values = np.zeros(capacity)
+        self.capacity = capacity
+        self.head = 0
+        self.tail = 0
+
+    def push(self, value: float) -> None:
+        head = self.head
+        self.values[head % self.capacity] = value
+        self.head = head + 1
+
+    def drain(self):
+        """Returns (values pushed since the last drain, number dropped)"""
+        head = self.head
+        start = max(self.tail, head - self.capacity)
+        idx = np.arange(start, head) % self.capacity
+        values = self.values[idx]
+        # slots the producer overwrote while they were being copied
+        overwritten = min(
+            len(values), max(0, self.head - self.capacity - start))
+        values = values[overwritten:]
+        dropped = start + overwritten - self.tail
+        self.tail = head
+        return values, dropped
+
+
+class MetricsSink:
+    """
+    Buffers scalar metrics and flushes their mean/min/max/count to
+    TensorBoard from a background thread.
+
+    Memory is bounded by capacity values per key; under pressure the oldest
+    values of a key are dropped and counted under metrics_sink/dropped.
+    Pass log_dir to write to a new SummaryWriter (needs tensorboard), or any
+    object with add_scalar(tag, value, step) and flush() as writer.
+    """
+
+    def __init__(
+            self,
+            log_dir: Optional[str] = None,
+            writer=None,
+            flush_interval: float = 5.0,
+            capacity: int = 4096
+            ):
+        if writer is None:
+            if SummaryWriter is None:
+                raise ImportError(
+                    "tensorboard is not installed, it is needed to write to "
+                    "log_dir. Install it with `pip install tensorboard`"
+                )
+            writer = SummaryWriter(log_dir=log_dir)
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.step = 0
+        self.dropped = 0
+        self._rings: Dict[str, _Ring] = {}
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, key: str, value: float) -> None:
+        """Buffers one value, call from the training thread only"""
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = _Ring(self.capacity)
+        ring.push(value)
+
+    def set_step(self, step: int) -> None:
+        """Step the next flush is logged at, e.g. num_timesteps"""
+        self.step = step
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the stats of everything recorded since the last flush"""
+        with self._flush_lock:
+            step = self.step
+            dropped = 0
+            for key, ring in list(self._rings.items()):
+                values, n_dropped = ring.drain()
+                dropped += n_dropped
+                if len(values) == 0:
+                    continue
+                self.writer.add_scalar(f'{key}/mean', values.mean(), step)
+                self.writer.add_scalar(f'{key}/min', values.min(), step)
+                self.writer.add_scalar(f'{key}/max', values.max(), step)
+                self.writer.add_scalar(f'{key}/count', len(values), step)
+            if dropped:
+                self.dropped += dropped
+                self.writer.add_scalar(
+                    'metrics_sink/dropped', self.dropped, step)
+            self.writer.flush()
+
+    def close(self) -> None:
+        """Stops the thread, flushes what is left and closes the writer"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        if hasattr(self.writer, 'close'):
+            self.writer.close()
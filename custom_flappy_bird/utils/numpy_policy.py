@@ -0,0 +1,199 @@
+"""
+Torch-free inference for sb3 PPO MlpPolicy models on Discrete action spaces.
+
+export_policy() turns a saved model .zip into a small .npz of weights (this
+step loads sb3/torch once). NumpyPolicy then runs batched forward passes on
+that .npz with only NumPy, so evaluation processes never import torch.
+"""
+
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from numpy import ndarray
+import gymnasium as gym
+
+_ACTIVATIONS = {
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+    'identity': lambda x: x,
+}
+
+
+def export_policy(
+        model_path: os.PathLike,
+        out_path: Optional[os.PathLike] = None
+        ) -> str:
+    """
+    Saves the actor network of an sb3 PPO model .zip as a .npz, by default
+    next to it with the same name. Returns the path written.
+    """
+    # Only the exporter needs sb3/torch
+    from torch import nn
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.torch_layers import FlattenExtractor
+
+    out_path = out_path or os.path.splitext(model_path)[0] + '.npz'
+    policy = PPO.load(model_path, device='cpu').policy
+    if not isinstance(policy.action_space, gym.spaces.Discrete):
+        raise ValueError(
+            f"Only Discrete action spaces are supported, got "
+            f"{policy.action_space}"
+        )
+    if not isinstance(policy.pi_features_extractor, FlattenExtractor):
+        raise ValueError("Only MlpPolicy (FlattenExtractor) is supported")
+
+    arrays = {}
+    activation = 'identity'
+    n_layers = 0
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, nn.Linear):
+            arrays[f'w{n_layers}'] = module.weight.detach().numpy().T
+            arrays[f'b{n_layers}'] = module.bias.detach().numpy()
+            n_layers += 1
+        elif isinstance(module, nn.Tanh):
+            activation = 'tanh'
+        elif isinstance(module, nn.ReLU):
+            activation = 'relu'
+        else:
+            raise ValueError(f"Unsupported layer {module}")
+    arrays[f'w{n_layers}'] = policy.action_net.weight.detach().numpy().T
+    arrays[f'b{n_layers}'] = policy.action_net.bias.detach().numpy()
+
+    np.savez(
+        out_path,
+        n_layers=n_layers,
+        activation=activation,
+        obs_shape=np.asarray(policy.observation_space.shape),
+        **arrays
+    )
+    print(f'Policy exported to: {str(out_path)}')
+    return out_path
+
+
+class NumpyPolicy:
+    """
+    Actor network of an exported PPO MlpPolicy. predict() follows the sb3
+    signature so it can stand in for model.predict() in evaluation loops.
+    Deterministic actions are the argmax of the logits exactly as in sb3;
+    stochastic ones are sampled from the same categorical distribution.
+    """
+
+    def __init__(
+            self,
+            weights: List[Tuple[ndarray, ndarray]],
+            activation: str = 'tanh',
+            obs_shape: Optional[Tuple[int]] = None,
+            seed: Optional[int] = None
+            ):
+        """
+        :param weights: (W, b) per layer with W shaped (in, out), the last
+          pair being the action head
+        :param activation: activation between hidden layers
+        :param obs_shape: shape of a single observation, used to tell
+          batched from single observations
+        :param seed: seed for stochastic action sampling
+        """
+        self.weights = [
+            (np.asarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32))
+            for w, b in weights
+        ]
+        self.activation = activation
+        self._activation = _ACTIVATIONS[activation]
+        self.obs_shape = tuple(obs_shape) if obs_shape is not None \
+            else (self.weights[0][0].shape[0],)
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, path: os.PathLike, seed: Optional[int] = None):
+        """Loads a .npz written by export_policy"""
+        with np.load(path) as data:
+            n_layers = int(data['n_layers'])
+            weights = [
+                (data[f'w{i}'], data[f'b{i}']) for i in range(n_layers + 1)
+            ]
+            return cls(
+                weights,
+                activation=str(data['activation']),
+                obs_shape=tuple(data['obs_shape']),
+                seed=seed,
+            )
+
+    def logits(self, obs: ndarray) -> ndarray:
+        """Action logits for a (batch, *obs_shape) array of observations"""
+        x = np.asarray(obs, dtype=np.float32).reshape(len(obs), -1)
+        for w, b in self.weights[:-1]:
+            x = self._activation(x @ w + b)
+        w, b = self.weights[-1]
+        return x @ w + b
+
+    def predict(
+            self,
+            observation: ndarray,
+            state=None,
+            episode_start=None,
+            deterministic: bool = False
+            ) -> Tuple[ndarray, None]:
+        """Returns (actions, None) like sb3's BaseAlgorithm.predict"""
+        observation = np.asarray(observation)
+        single = observation.shape == self.obs_shape
+        if single:
+            observation = observation[None]
+        logits = self.logits(observation)
+        if not deterministic:
+            # Gumbel-max trick: argmax(logits + Gumbel noise) is a sample
+            # from softmax(logits)
+            logits = logits - np.log(-np.log(self.rng.random(logits.shape)))
+        actions = logits.argmax(axis=1)
+        if single:
+            actions = actions[0]
+        return actions, None
+
+
+def evaluate_numpy_policy(
+        policy: NumpyPolicy,
+        envs: gym.vector.VectorEnv,
+        n_eval_episodes: int = 10,
+        deterministic: bool = True,
+        seed: Optional[int] = None,
+        return_episode_rewards: bool = False
+        ):
+    """
+    Counterpart of sb3's evaluate_policy for a gymnasium VectorEnv, e.g. from
+    gymnasium.make_vec. Episodes are spread evenly over the envs as sb3 does.
+    Returns (mean, std) of the episode rewards, or the lists of episode
+    rewards and lengths if return_episode_rewards.
+    """
+    n_envs = envs.num_envs
+    targets = np.array(
+        [(n_eval_episodes + i) // n_envs for i in range(n_envs)])
+    counts = np.zeros(n_envs, dtype=int)
+    current_rewards = np.zeros(n_envs)
+    current_lengths = np.zeros(n_envs, dtype=int)
+    episode_rewards = []
+    episode_lengths = []
+    # With next-step autoreset the step after a done only resets that env
+    next_step = envs.metadata.get(
+        'autoreset_mode', gym.vector.AutoresetMode.NEXT_STEP
+    ) == gym.vector.AutoresetMode.NEXT_STEP
+    resetting = np.zeros(n_envs, dtype=bool)
+
+    obs, _ = envs.reset(seed=seed)
+    while (counts < targets).any():
+        actions, _ = policy.predict(obs, deterministic=deterministic)
+        obs, rewards, terminated, truncated, _ = envs.step(actions)
+        dones = (terminated | truncated) & ~resetting
+        current_rewards += np.where(resetting, 0, rewards)
+        current_lengths += ~resetting
+        for i in np.flatnonzero(dones):
+            if counts[i] < targets[i]:
+                episode_rewards.append(current_rewards[i])
+                episode_lengths.append(current_lengths[i])
+                counts[i] += 1
+            current_rewards[i] = 0
+            current_lengths[i] = 0
+        if next_step:
+            resetting = dones
+
+    if return_episode_rewards:
+        return episode_rewards, episode_lengths
+    return float(np.mean(episode_rewards)), float(np.std(episode_rewards))
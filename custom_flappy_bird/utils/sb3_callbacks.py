@@ -1,12 +1,18 @@
 """Custom callbacks to pass to stable_baselines3 for FlappyBird"""
 
-from typing import Dict, Any
+import os
+import time
+import warnings
+from typing import Dict, Any, Optional
 import numpy as np
 import torch as th
 import gymnasium as gym
 from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.logger import Video
+from utils.utils import reconfigure_vec_env
+from utils.metrics import MetricsSink
+from gym_env.memory import sample_memory, dump_heap_snapshot
 
 
 # https://stable-baselines3.readthedocs.io/en/master/guide/callbacks.html
@@ -78,6 +84,215 @@ class CustomScoreCallback(BaseCallback):
         return True
 
 
+class EnvScheduleCallback(BaseCallback):
+    """
+    Curriculum over env arguments. Once num_timesteps reaches a key of
+    schedule, its dict is passed to reconfigure() on every training env, e.g.
+        EnvScheduleCallback({0: {'pipe_gap': 150}, 2e6: {'pipe_gap': 100}})
+    Pass the run's config, timestamp and folder to keep the saved json in
+    step with the envs.
+    """
+    def __init__(
+            self,
+            schedule: Dict[int, Dict[str, Any]],
+            config: Optional[dict] = None,
+            timestamp: Optional[str] = None,
+            folder: Optional[os.PathLike] = None,
+            verbose: int = 0
+            ):
+        super().__init__(verbose)
+        self._schedule = sorted(schedule.items())
+        self._config = config
+        self._timestamp = timestamp
+        self._folder = folder
+
+    def _on_step(self) -> bool:
+        while self._schedule and self.num_timesteps >= self._schedule[0][0]:
+            _, env_config = self._schedule.pop(0)
+            reconfigure_vec_env(
+                self.training_env,
+                config=self._config,
+                timestamp=self._timestamp,
+                folder=self._folder,
+                **env_config
+            )
+            for key, value in env_config.items():
+                if isinstance(value, (int, float)):
+                    self.logger.record(f'env_config/{key}', value)
+            if self.verbose > 0:
+                print(f'Reconfigured envs at {self.num_timesteps} steps: '
+                      f'{env_config}')
+        return True
+
+
+class MetricsSinkCallback(BaseCallback):
+    """
+    Logs custom per-step metrics through a MetricsSink, so that writing
+    them to TensorBoard happens on a background thread. Other callbacks
+    given this instance call record(key, value) from their _on_step.
+    Also records the wall time of each vec env step as perf/step_ms.
+    Events go to the run's TensorBoard folder, or log_dir if given.
+    """
+    def __init__(
+            self,
+            log_dir: Optional[os.PathLike] = None,
+            flush_interval: float = 5.0,
+            capacity: int = 4096,
+            verbose: int = 0
+            ):
+        super().__init__(verbose)
+        self._log_dir = log_dir
+        self._flush_interval = flush_interval
+        self._capacity = capacity
+        self._last_step_time = None
+        self.sink = None
+
+    def _on_training_start(self) -> None:
+        log_dir = self._log_dir or self.logger.get_dir()
+        if log_dir is None:
+            raise ValueError(
+                "MetricsSinkCallback needs log_dir when the model has no "
+                "tensorboard_log"
+            )
+        self.sink = MetricsSink(
+            log_dir=str(log_dir),
+            flush_interval=self._flush_interval,
+            capacity=self._capacity,
+        )
+
+    def record(self, key: str, value: float) -> None:
+        if self.sink is not None:
+            self.sink.record(key, value)
+
+    def _on_step(self) -> bool:
+        now = time.perf_counter()
+        if self._last_step_time is not None:
+            self.sink.record('perf/step_ms',
+                             (now - self._last_step_time) * 1000)
+        self._last_step_time = now
+        self.sink.set_step(self.num_timesteps)
+        return True
+
+    def _on_rollout_end(self) -> None:
+        # time spent training between rollouts is not a step
+        self._last_step_time = None
+
+    def _on_training_end(self) -> None:
+        self.sink.close()
+
+
+class MemoryMonitorCallback(BaseCallback):
+    """
+    Every sample_freq calls, logs under mem/ the RSS of the learner and of
+    each vec env worker process (sampled in the worker through env_method)
+    and their total. With top_n > 0, tracemalloc is started everywhere and
+    traced sizes are logged too, the top_n allocating lines being printed
+    with verbose > 0. trace_allocations starts tracemalloc everywhere at the
+    start of training without the top_n logging. When the total goes over
+    soft_limit_mb, warns and dumps a tracemalloc snapshot of every process
+    into snapshot_dir (the run's TensorBoard folder by default), once per
+    crossing. Snapshots need tracing, so top_n > 0 or trace_allocations,
+    which makes training about twice as slow; RSS sampling alone does not
+    trace.
+    """
+    def __init__(
+            self,
+            sample_freq: int = 10000,
+            top_n: int = 0,
+            trace_allocations: bool = False,
+            soft_limit_mb: Optional[float] = None,
+            snapshot_dir: Optional[os.PathLike] = None,
+            verbose: int = 0
+            ):
+        super().__init__(verbose)
+        self._sample_freq = sample_freq
+        self._top_n = top_n
+        self._trace = trace_allocations
+        self._soft_limit_mb = soft_limit_mb
+        self._snapshot_dir = snapshot_dir
+        self._over_limit = False
+
+    def _on_training_start(self) -> None:
+        if self._trace:
+            # start tracing now, so snapshots cover the whole run
+            sample_memory(trace=True)
+            self.training_env.env_method('memory_stats', 0, True)
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self._sample_freq == 0:
+            self.sample()
+        return True
+
+    def sample(self) -> Dict[str, float]:
+        """Samples every process now, returns what was logged"""
+        learner = sample_memory(self._top_n, self._trace)
+        # DummyVecEnv workers run in the learner process, count it once
+        workers = {}
+        for i, stats in enumerate(self.training_env.env_method(
+                'memory_stats', self._top_n, self._trace)):
+            if stats['pid'] != learner['pid'] and stats['pid'] not in {
+                    s['pid'] for s in workers.values()}:
+                workers[i] = stats
+
+        logged = {'mem/learner_rss_mb': learner['rss_mb']}
+        for i, stats in workers.items():
+            logged[f'mem/worker{i}_rss_mb'] = stats['rss_mb']
+        logged['mem/total_rss_mb'] = learner['rss_mb'] + sum(
+            stats['rss_mb'] for stats in workers.values())
+        if 'traced_mb' in learner:
+            logged['mem/learner_traced_mb'] = learner['traced_mb']
+            logged['mem/learner_traced_peak_mb'] = learner['traced_peak_mb']
+        for i, stats in workers.items():
+            if 'traced_mb' in stats:
+                logged[f'mem/worker{i}_traced_mb'] = stats['traced_mb']
+        for key, value in logged.items():
+            self.logger.record(key, value)
+
+        processes = {'learner': learner}
+        processes.update({f'worker{i}': s for i, s in workers.items()})
+        if self.verbose > 0:
+            for name, stats in processes.items():
+                for location, size in stats.get('top', []):
+                    print(f'{name} {size:8.2f} MB  {location}')
+
+        total = logged['mem/total_rss_mb']
+        if self._soft_limit_mb is None or total <= self._soft_limit_mb:
+            self._over_limit = False
+        elif not self._over_limit:
+            self._over_limit = True
+            self._on_soft_limit(total, processes, workers)
+        return logged
+
+    def _on_soft_limit(
+            self,
+            total: float,
+            processes: Dict[str, Dict],
+            workers: Dict[int, Dict]
+            ) -> None:
+        folder = self._snapshot_dir or self.logger.get_dir() or '.'
+        prefix = os.path.join(folder, f'heap_{self.num_timesteps}')
+        dumped = [dump_heap_snapshot(f'{prefix}_learner.pickle')]
+        for i in workers:
+            dumped += self.training_env.env_method(
+                'dump_heap_snapshot', f'{prefix}_worker{i}.pickle',
+                indices=[i])
+        dumped = [path for path in dumped if path is not None]
+        top = [
+            f'  {name} {size:.2f} MB {location}'
+            for name, stats in processes.items()
+            for location, size in stats.get('top', [])[:3]
+        ]
+        warnings.warn(
+            f"Memory soft limit of {self._soft_limit_mb:.0f} MB exceeded: "
+            f"{total:.0f} MB in total at {self.num_timesteps} steps. "
+            + (f"Heap snapshots: {dumped}" if dumped else
+               "Pass trace_allocations=True or top_n > 0 to dump "
+               "snapshots")
+            + ('\n' + '\n'.join(top) if top else ''),
+            ResourceWarning,
+        )
+
+
 #######################################################################
 # No need to touch anything below this line
 # These appear to be broken currently because of recent deprecations in moviepy
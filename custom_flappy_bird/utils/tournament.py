@@ -0,0 +1,193 @@
+"""
+Evaluate several policies on the same seeded episodes with one shared set of
+env workers, and rank them.
+"""
+
+import csv
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+from .numpy_policy import NumpyPolicy, export_policy
+
+RESULT_FIELDS = [
+    'rank',
+    'name',
+    'episodes',
+    'mean_reward',
+    'reward_ci95',
+    'mean_score',
+    'score_ci95',
+    'mean_length',
+    'steps',
+    'steps_per_sec',
+    'inference_steps_per_sec',
+]
+
+
+def load_checkpoints(paths: Sequence[os.PathLike]) -> Dict[str, NumpyPolicy]:
+    """
+    Loads each path once as a NumpyPolicy. A path may be a run folder
+    (its best_model is used), a model .zip (exported to .npz beside it if
+    not done before) or an exported .npz. Run folders are named after the
+    folder, files after the folder and file name.
+    """
+    policies = {}
+    for path in paths:
+        path = str(path)
+        if os.path.isdir(path):
+            name = os.path.basename(os.path.normpath(path))
+            path = os.path.join(path, 'best_model.zip')
+        else:
+            name = os.path.join(
+                os.path.basename(os.path.dirname(os.path.abspath(path))),
+                os.path.splitext(os.path.basename(path))[0])
+        npz = os.path.splitext(path)[0] + '.npz'
+        if not os.path.exists(npz):
+            export_policy(path, npz)
+        policies[name] = NumpyPolicy.load(npz)
+    return policies
+
+
+def make_tournament_envs(
+        env_id: str,
+        num_envs: int,
+        vectorization_mode: str = 'async',
+        **env_kwargs
+        ) -> gym.vector.VectorEnv:
+    """Vector env with autoreset disabled, as run_tournament expects"""
+    return gym.make_vec(
+        env_id,
+        num_envs=num_envs,
+        vectorization_mode=vectorization_mode,
+        vector_kwargs={'autoreset_mode': AutoresetMode.DISABLED},
+        **env_kwargs
+    )
+
+
+def _ci95(values: np.ndarray) -> float:
+    if len(values) < 2:
+        return 0.0
+    return float(1.96 * values.std(ddof=1) / np.sqrt(len(values)))
+
+
+def run_tournament(
+        policies: Dict[str, NumpyPolicy],
+        envs: gym.vector.VectorEnv,
+        n_eval_episodes: int = 20,
+        seed: int = 0,
+        deterministic: bool = True
+        ) -> List[dict]:
+    """
+    Plays episode seeds seed .. seed + n_eval_episodes - 1 with every policy
+    and returns one summary row per policy, best mean reward first.
+
+    Episodes of all policies share the workers of envs (made by
+    make_tournament_envs): each vec step groups the observations by policy
+    and runs one batched forward pass per policy.
+    """
+    names = list(policies)
+    n_envs = envs.num_envs
+    # Interleaved so that every vec step mixes as many policies as possible
+    jobs = deque(
+        (p, episode) for episode in range(n_eval_episodes)
+        for p in range(len(names))
+    )
+    owner = np.full(n_envs, -1)
+    rewards = np.zeros(n_envs)
+    lengths = np.zeros(n_envs, dtype=int)
+    results = {p: [] for p in range(len(names))}
+    inference_time = np.zeros(len(names))
+    steps = np.zeros(len(names), dtype=int)
+
+    def assign(mask: np.ndarray):
+        seeds = [None] * n_envs
+        for i in np.flatnonzero(mask):
+            owner[i] = -1
+            if jobs:
+                owner[i], episode = jobs.popleft()
+                seeds[i] = seed + episode
+            rewards[i] = 0
+            lengths[i] = 0
+        return envs.reset(seed=seeds, options={'reset_mask': mask})
+
+    start = time.perf_counter()
+    obs, _ = assign(np.ones(n_envs, dtype=bool))
+    actions = np.zeros(n_envs, dtype=int)
+    while (owner >= 0).any():
+        for p in np.unique(owner[owner >= 0]):
+            idx = np.flatnonzero(owner == p)
+            t = time.perf_counter()
+            actions[idx], _ = policies[names[p]].predict(
+                obs[idx], deterministic=deterministic)
+            inference_time[p] += time.perf_counter() - t
+            steps[p] += len(idx)
+        obs, reward, terminated, truncated, info = envs.step(actions)
+        active = owner >= 0
+        rewards[active] += reward[active]
+        lengths[active] += 1
+
+        dones = terminated | truncated
+        for i in np.flatnonzero(dones & active):
+            results[owner[i]].append(
+                (rewards[i], info['score'][i], lengths[i]))
+        if dones.any():
+            obs, _ = assign(dones)
+    elapsed = time.perf_counter() - start
+
+    table = []
+    for p, name in enumerate(names):
+        episodes = np.array(results[p], dtype=float).reshape(-1, 3)
+        table.append({
+            'name': name,
+            'episodes': len(episodes),
+            'mean_reward': float(episodes[:, 0].mean()),
+            'reward_ci95': _ci95(episodes[:, 0]),
+            'mean_score': float(episodes[:, 1].mean()),
+            'score_ci95': _ci95(episodes[:, 1]),
+            'mean_length': float(episodes[:, 2].mean()),
+            'steps': int(steps[p]),
+            'steps_per_sec': float(steps[p] / elapsed),
+            'inference_steps_per_sec': float(
+                steps[p] / max(inference_time[p], 1e-9)),
+        })
+    table.sort(key=lambda row: (row['mean_reward'], row['mean_score']),
+               reverse=True)
+    for rank, row in enumerate(table, start=1):
+        row['rank'] = rank
+    return table
+
+
+def save_results(
+        table: List[dict],
+        folder: os.PathLike,
+        meta: Optional[dict] = None
+        ) -> None:
+    """Writes the table as results.json (with meta) and results.csv"""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'results.json'), 'w') as fp:
+        json.dump({'meta': meta or {}, 'results': table}, fp, indent=2)
+    with open(os.path.join(folder, 'results.csv'), 'w', newline='') as fp:
+        writer = csv.DictWriter(fp, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(table)
+    print(f'Results saved to: {str(folder)}')
+
+
+def format_table(table: List[dict]) -> str:
+    """Ranked table as aligned text for printing"""
+    lines = [
+        f"{'rank':>4}  {'reward':>17}  {'score':>15}  {'steps/s':>9}  name"
+    ]
+    for row in table:
+        lines.append(
+            f"{row['rank']:>4}  "
+            f"{row['mean_reward']:>8.2f} +/-{row['reward_ci95']:>6.2f}  "
+            f"{row['mean_score']:>6.2f} +/-{row['score_ci95']:>6.2f}  "
+            f"{row['steps_per_sec']:>9.0f}  {row['name']}"
+        )
+    return '\n'.join(lines)
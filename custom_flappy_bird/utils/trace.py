@@ -0,0 +1,252 @@
+"""
+Record what the agent saw and did to disk, and read it back lazily.
+
+A trace is a folder of raw memory-mapped arrays, one per field, plus
+meta.json (length, dtypes, shapes) and episodes.npy, the (start, end) step
+range of every finished episode. Step t holds the observation the action
+was taken on, the action, and the reward, done and score that followed.
+"""
+
+import itertools
+import json
+import os
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+from numpy import ndarray
+import gymnasium as gym
+
+_env_counter = itertools.count()
+
+
+def _fields(obs_shape: Tuple[int], obs_dtype) -> Dict[str, Tuple]:
+    return {
+        'obs': (np.dtype(obs_dtype), tuple(obs_shape)),
+        'action': (np.dtype(np.int64), ()),
+        'reward': (np.dtype(np.float32), ()),
+        'done': (np.dtype(np.bool_), ()),
+        'score': (np.dtype(np.int32), ()),
+    }
+
+
+class TraceWriter:
+    """
+    Streams steps into growable memory-mapped files in a folder.
+
+    Steps are buffered in RAM chunks of chunk_size and copied into the
+    memmaps a chunk at a time; the files are preallocated and doubled when
+    full, then cut to length on close(). meta.json and episodes.npy are
+    rewritten on every chunk, so a trace stays readable up to the last
+    chunk if the process dies.
+    """
+
+    def __init__(
+            self,
+            folder: os.PathLike,
+            obs_shape: Tuple[int],
+            obs_dtype=np.float32,
+            chunk_size: int = 4096,
+            initial_capacity: int = 65536
+            ):
+        self.folder = str(folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.fields = _fields(obs_shape, obs_dtype)
+        self.chunk_size = chunk_size
+        self.length = 0
+        self.episodes = []
+        self._episode_start = 0
+        self._capacity = 0
+        self._maps = {}
+        self._chunk = {
+            name: np.zeros((chunk_size,) + shape, dtype=dtype)
+            for name, (dtype, shape) in self.fields.items()
+        }
+        self._n = 0
+        self._grow(max(initial_capacity, chunk_size))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, f'{name}.bin')
+
+    def _grow(self, capacity: int) -> None:
+        for name, (dtype, shape) in self.fields.items():
+            nbytes = capacity * dtype.itemsize * int(np.prod(shape))
+            self._maps.pop(name, None)
+            with open(self._path(name), 'ab') as fp:
+                fp.truncate(nbytes)
+            self._maps[name] = np.memmap(
+                self._path(name), dtype=dtype, mode='r+',
+                shape=(capacity,) + shape)
+        self._capacity = capacity
+
+    def write(
+            self,
+            obs: ndarray,
+            action: int,
+            reward: float,
+            done: bool,
+            score: int
+            ) -> None:
+        n = self._n
+        chunk = self._chunk
+        chunk['obs'][n] = obs
+        chunk['action'][n] = action
+        chunk['reward'][n] = reward
+        chunk['done'][n] = done
+        chunk['score'][n] = score
+        self._n = n + 1
+        if done:
+            end = self.length + self._n
+            self.episodes.append((self._episode_start, end))
+            self._episode_start = end
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def start_episode(self) -> None:
+        """
+        Starts the next episode at the next step. Steps of an episode that
+        was cut short without a done stay in the files but are not indexed.
+        """
+        self._episode_start = self.length + self._n
+
+    def flush(self) -> None:
+        """Copies the buffered steps into the files and updates the index"""
+        n = self._n
+        if self.length + n > self._capacity:
+            self._grow(max(2 * self._capacity, self.length + n))
+        for name, data in self._chunk.items():
+            self._maps[name][self.length:self.length + n] = data[:n]
+            self._maps[name].flush()
+        self.length += n
+        self._n = 0
+        self._write_meta()
+
+    def _write_meta(self) -> None:
+        np.save(
+            os.path.join(self.folder, 'episodes.npy'),
+            np.array(self.episodes, dtype=np.int64).reshape(-1, 2))
+        meta = {
+            'length': self.length,
+            'fields': {
+                name: {'dtype': dtype.str, 'shape': list(shape)}
+                for name, (dtype, shape) in self.fields.items()
+            },
+        }
+        with open(os.path.join(self.folder, 'meta.json'), 'w') as fp:
+            json.dump(meta, fp, indent=2)
+
+    def close(self) -> None:
+        """Flushes and cuts the files to the recorded length"""
+        if self._maps is None:
+            return
+        self.flush()
+        self._maps = None
+        for name, (dtype, shape) in self.fields.items():
+            with open(self._path(name), 'r+b') as fp:
+                fp.truncate(self.length * dtype.itemsize * int(np.prod(shape)))
+
+
+class RecordTrace(gym.Wrapper, gym.utils.RecordConstructorArgs):
+    """
+    Records every step of the wrapped env with a TraceWriter. Each env gets
+    its own subfolder of trace_folder, so it can be given to all the envs of
+    a vec env. Only finished episodes are indexed; steps of an episode cut
+    short by reset() or close() are kept but not listed in episodes.npy.
+    """
+
+    def __init__(
+            self,
+            env: gym.Env,
+            trace_folder: os.PathLike,
+            name_prefix: str = 'env',
+            chunk_size: int = 4096
+            ):
+        gym.utils.RecordConstructorArgs.__init__(
+            self,
+            trace_folder=trace_folder,
+            name_prefix=name_prefix,
+            chunk_size=chunk_size
+        )
+        gym.Wrapper.__init__(self, env)
+        while True:
+            folder = os.path.join(
+                str(trace_folder),
+                f'{name_prefix}-{os.getpid()}-{next(_env_counter)}')
+            try:
+                os.makedirs(folder)
+                break
+            except FileExistsError:
+                continue
+        self.writer = TraceWriter(
+            folder,
+            env.observation_space.shape,
+            env.observation_space.dtype,
+            chunk_size=chunk_size,
+        )
+        self._obs = None
+
+    def reset(self, *, seed=None, options=None):
+        obs, info = self.env.reset(seed=seed, options=options)
+        self.writer.start_episode()
+        self._obs = obs
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.write(
+            self._obs, action, reward, terminated or truncated,
+            info.get('score', 0))
+        self._obs = obs
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+class TraceReader:
+    """
+    Read-only view of a trace folder. Arrays are memory-mapped, so episodes
+    are only read from disk when their data is used.
+    """
+
+    def __init__(self, folder: os.PathLike):
+        self.folder = str(folder)
+        with open(os.path.join(self.folder, 'meta.json')) as fp:
+            meta = json.load(fp)
+        self.length = meta['length']
+        self.episodes = np.load(os.path.join(self.folder, 'episodes.npy'))
+        self.data = {}
+        for name, field in meta['fields'].items():
+            shape = (self.length,) + tuple(field['shape'])
+            self.data[name] = np.memmap(
+                os.path.join(self.folder, f'{name}.bin'),
+                dtype=np.dtype(field['dtype']), mode='r',
+                shape=shape) if self.length else \
+                np.zeros(shape, dtype=np.dtype(field['dtype']))
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    def episode(self, i: int) -> Dict[str, ndarray]:
+        """Fields of episode i as views into the files"""
+        start, end = self.episodes[i]
+        return {name: data[start:end] for name, data in self.data.items()}
+
+    def __iter__(self) -> Iterator[Dict[str, ndarray]]:
+        for i in range(len(self)):
+            yield self.episode(i)
+
+
+def iter_episodes(
+        trace_folder: os.PathLike,
+        max_episodes: Optional[int] = None
+        ) -> Iterator[Dict[str, ndarray]]:
+    """Yields the episodes of every trace under trace_folder (e.g. all envs)"""
+    count = 0
+    for root, _, files in sorted(os.walk(str(trace_folder))):
+        if 'meta.json' not in files:
+            continue
+        for episode in TraceReader(root):
+            if max_episodes is not None and count >= max_episodes:
+                return
+            yield episode
+            count += 1
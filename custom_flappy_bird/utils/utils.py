@@ -36,3 +36,29 @@ def get_time_str():
     now = datetime.now(tzinfo)
     now_str = now.strftime('%Y%m%d-%H%M%S')
     return now_str
+
+
+def reconfigure_vec_env(
+        vec_env,
+        config: Optional[dict] = None,
+        timestamp: Optional[str] = None,
+        folder: Optional[os.PathLike] = None,
+        **env_config
+        ) -> None:
+    """
+    Calls reconfigure(**env_config) on every env of an sb3 VecEnv, which
+    applies at each env's next reset. If config is given its 'env_kwargs'
+    are updated to match, and saved again if timestamp and folder are given.
+    A hard_state_reservoir cannot be sent to running workers, pass it to the
+    envs when they are made.
+    """
+    if 'hard_state_reservoir' in env_config:
+        raise ValueError(
+            "hard_state_reservoir cannot be changed through the vec env, "
+            "pass it in env_kwargs when making the envs"
+        )
+    vec_env.env_method('reconfigure', **env_config)
+    if config is not None:
+        config.setdefault('env_kwargs', {}).update(env_config)
+        if timestamp is not None and folder is not None:
+            save_config(config=config, timestamp=timestamp, folder=folder)
@@ -0,0 +1,96 @@
+"""
+Video writers that take frames one at a time and keep nothing in memory,
+so the cost of recording does not grow with episode length.
+"""
+
+import os
+import struct
+import numpy as np
+from numpy import ndarray
+
+
+class GifWriter:
+    """
+    Writes an animated GIF frame by frame. Each frame is quantized to its
+    own 256 colour palette (fast octree, the game has few colours) and
+    encoded straight to the file, where imageio's pillow writer keeps every
+    frame until close.
+    """
+
+    def __init__(self, path: os.PathLike, fps: float = 30, loop: int = 0):
+        self._fp = open(path, 'wb')
+        self._duration = 1000 / fps
+        self._loop = loop
+        self._size = None
+
+    def _write_header(self, width: int, height: int) -> None:
+        # No global colour table, every frame carries its own
+        self._fp.write(
+            b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0))
+        # Netscape looping extension
+        self._fp.write(b'!\xff\x0bNETSCAPE2.0\x03\x01'
+                       + struct.pack('<H', self._loop) + b'\x00')
+
+    def append_data(self, frame: ndarray) -> None:
+        from PIL import Image, GifImagePlugin
+
+        image = Image.fromarray(np.ascontiguousarray(frame[..., :3]))
+        if self._size is None:
+            self._size = image.size
+            self._write_header(*image.size)
+        elif image.size != self._size:
+            raise ValueError(
+                f"Frame size {image.size} differs from the first frame "
+                f"{self._size}"
+            )
+        image = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+        for chunk in GifImagePlugin.getdata(
+                image,
+                include_color_table=True,
+                duration=self._duration):
+            self._fp.write(chunk)
+
+    def close(self) -> None:
+        if self._fp.closed:
+            return
+        self._fp.write(b';')
+        self._fp.close()
+
+    def __enter__(self) -> 'GifWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class _EvenSizeWriter:
+    """
+    Crops frames to even width and height, which libx264 with yuv420p
+    needs, instead of letting imageio resize them to a macro block size
+    """
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def append_data(self, frame: ndarray) -> None:
+        height, width = frame.shape[:2]
+        self._writer.append_data(frame[:height - height % 2,
+                                       :width - width % 2])
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def get_video_writer(path: os.PathLike, fps: float = 30):
+    """
+    Streaming writer for path by extension: GifWriter for .gif, otherwise
+    imageio's ffmpeg writer (e.g. .mp4), which pipes frames to ffmpeg
+    after cropping odd sizes by a pixel. Both have append_data(frame) and
+    close().
+    """
+    if str(path).lower().endswith('.gif'):
+        return GifWriter(path, fps=fps)
+    import imageio
+    # macro_block_size=1 keeps downscaled frames at their size
+    return _EvenSizeWriter(
+        imageio.get_writer(path, fps=fps, macro_block_size=1))
@@ -186,6 +186,14 @@ class RecordBestVideo(
         self.best_reward = -np.inf
         self.episode_reward = 0.0
         self.second_metric_value = 0.0
+        # envs rendering the frames they skip only need to while recording
+        self._set_frame_capture(False)
+
+    def _set_frame_capture(self, enabled: bool):
+        try:
+            self.env.get_wrapper_attr('set_skipped_frame_capture')(enabled)
+        except AttributeError:
+            pass
 
     def _capture_frame(self):
         assert self.recording, "Cannot capture a frame, recording wasn't started."
@@ -195,6 +203,8 @@ class RecordBestVideo(
             if len(frame) == 0:  # render was called
                 return
             self.render_history += frame
+            # e.g. frames skipped by the env's frame_skip, keeps videos smooth
+            self.recorded_frames += frame[:-1]
             frame = frame[-1]
 
         if isinstance(frame, np.ndarray):
@@ -211,6 +221,8 @@ class RecordBestVideo(
         """Reset the environment and eventually starts a new recording."""
         obs, info = super().reset(seed=seed, options=options)
         self.episode_id += 1
+        # frames nobody asked for with render() are only kept for an episode
+        self.render_history = []
 
         if self.recording and self.video_length == float("inf"):
             self.stop_recording()
@@ -275,6 +287,7 @@ class RecordBestVideo(
 
         self.recording = True
         self._video_name = video_name
+        self._set_frame_capture(True)
 
     def stop_recording(self):
         """Stop current recording and saves the video."""
@@ -306,6 +319,7 @@ class RecordBestVideo(
         self.recorded_frames = []
         self.recording = False
         self._video_name = None
+        self._set_frame_capture(False)
 
     def __del__(self):
         """Warn the user in case last video wasn't saved."""
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import gymnasium
 # from gymnasium.utils.env_checker import check_env
 from stable_baselines3.common.env_checker import check_env
@@ -19,3 +20,317 @@ def test_env():
 
 def test_valid_env(test_env):
     check_env(test_env)
+
+
+def test_sprites_shared_between_envs():
+    from custom_flappy_bird.gym_env.assets import get_assets
+    env1 = gymnasium.make("customflappybird", render_mode="rgb_array")
+    env2 = gymnasium.make("customflappybird", render_mode="rgb_array")
+    images1 = env1.unwrapped._images
+    images2 = env2.unwrapped._images
+    assert images1 is not images2
+    assert images1["player"] is images2["player"]
+
+    assets = get_assets()
+    assert assets.images["base"] is images1["base"]
+    assert not assets.arrays["base"].flags.writeable
+    assert assets.hitmasks["pipe"][0].dtype == bool
+    env1.reset(seed=0)
+    assert env1.render().shape == (512, 288, 3)
+
+
+def test_preload_assets():
+    from custom_flappy_bird.gym_env.assets import (
+        clear_asset_cache, get_assets, preload_assets)
+    clear_asset_cache()
+    # nothing to decode for envs that do not render
+    assert preload_assets(render_mode=None, pipe_gap=120) is None
+    assets = preload_assets(env_config={"render_mode": "rgb_array"})
+    assert assets is get_assets()
+    # arrays and hitmasks are only built when asked for
+    assert "arrays" not in vars(assets)
+    assert assets.arrays["player"][0].shape[2] == 4
+
+
+def test_state_snapshot_roundtrip(test_env):
+    import pickle
+    env = test_env.unwrapped
+    env.reset(seed=1)
+    actions = [i % 7 == 0 for i in range(200)]
+    for a in actions[:40]:
+        env.step(int(a))
+    state = env.get_state()
+
+    def rollout(env):
+        out = []
+        for a in actions[40:]:
+            obs, reward, terminated, _, info = env.step(int(a))
+            out.append((obs.tolist(), reward, info["score"]))
+            if terminated:
+                break
+        return out
+
+    expected = rollout(env)
+    obs = env.set_state(state)
+    assert obs.shape == env.observation_space.shape
+    assert rollout(env) == expected
+
+    other = gymnasium.make("customflappybird").unwrapped
+    other.set_state(pickle.loads(pickle.dumps(state)).tobytes())
+    assert rollout(other) == expected
+
+
+def test_hard_state_reservoir():
+    from custom_flappy_bird.gym_env.hard_states import HardStateReservoir
+    reservoir = HardStateReservoir(capacity=2)
+    env = gymnasium.make(
+        "customflappybird",
+        hard_reset_prob=1.0,
+        hard_state_lookback=5,
+        hard_state_reservoir=reservoir,
+    ).unwrapped
+
+    # never flapping crashes into the ground and harvests a state
+    env.reset(seed=0)
+    terminated = False
+    while not terminated:
+        _, _, terminated, _, _ = env.step(0)
+    assert len(reservoir) == 1
+
+    _, info = env.reset()
+    assert info["hard_start"]
+    steps = 0
+    terminated = False
+    while not terminated:
+        _, _, terminated, _, _ = env.step(0)
+        steps += 1
+    assert steps <= 5
+    # died again, so the restarted state is now harder than a fresh one
+    assert reservoir._slots["difficulty"][0] == 2
+
+    state = env.get_state()
+    reservoir.add(state)
+    reservoir.add(state)
+    assert len(reservoir) == 2
+    assert reservoir._slots["difficulty"][0] == 2
+    assert reservoir._slots["age"][1] > 2
+
+
+def _add_fresh_state(reservoir):
+    env = gymnasium.make("customflappybird").unwrapped
+    env.reset(seed=0)
+    reservoir.add(env.get_state())
+
+
+def test_shared_hard_state_reservoir():
+    import multiprocessing
+    from custom_flappy_bird.gym_env.hard_states import HardStateReservoir
+    reservoir = HardStateReservoir(capacity=4, shared=True)
+    worker = multiprocessing.get_context("fork").Process(
+        target=_add_fresh_state, args=(reservoir,))
+    worker.start()
+    worker.join()
+
+    assert len(reservoir) == 1
+    _, _, state = reservoir.sample(np.random.default_rng(0))
+    env = gymnasium.make("customflappybird").unwrapped
+    env.reset(seed=0)
+    assert state.tobytes() == env.get_state().tobytes()
+    reservoir.close()
+
+
+def test_pipe_layout_pool():
+    env1 = gymnasium.make("customflappybird", pipe_pool_size=8).unwrapped
+    env2 = gymnasium.make("customflappybird", pipe_pool_size=8).unwrapped
+    obs1, info1 = env1.reset(seed=1, options={"pipe_layout": 3})
+    obs2, info2 = env2.reset(seed=2, options={"pipe_layout": 3})
+    assert info1["pipe_layout"] == info2["pipe_layout"] == 3
+    assert np.array_equal(obs1, obs2)
+    for _ in range(100):
+        obs1, *_ = env1.step(0)
+        obs2, *_ = env2.step(0)
+        assert np.array_equal(obs1, obs2)
+
+    _, info = env1.reset(seed=5)
+    assert 0 <= info["pipe_layout"] < 8
+    assert not env1.unwrapped._pipe_pool.flags.writeable
+
+
+def test_reconfigure_vec_env():
+    from stable_baselines3.common.env_util import make_vec_env
+    from custom_flappy_bird.utils.utils import reconfigure_vec_env
+    vec_env = make_vec_env("customflappybird", n_envs=2)
+    vec_env.reset()
+    config = {"env_kwargs": {"pipe_gap": 100}}
+    reconfigure_vec_env(vec_env, config, pipe_gap=150, score_limit=3)
+    assert config["env_kwargs"] == {"pipe_gap": 150, "score_limit": 3}
+
+    # applied at the next reset, not mid-episode
+    assert vec_env.get_attr("_pipe_gap") == [100, 100]
+    assert vec_env.env_method("get_config")[0]["pipe_gap"] == 150
+    vec_env.reset()
+    assert vec_env.get_attr("_pipe_gap") == [150, 150]
+    assert vec_env.get_attr("_score_limit") == [3, 3]
+
+    with pytest.raises(ValueError):
+        vec_env.env_method("reconfigure", pipe_gapp=120)
+    with pytest.raises(ValueError):
+        vec_env.env_method("reconfigure", use_lidar=True)
+    vec_env.env_method("reconfigure", screen_size=[288, 512])
+    with pytest.raises(ValueError):
+        reconfigure_vec_env(vec_env, hard_state_reservoir=None)
+
+    # bad values are refused up front instead of failing a later reset
+    for bad in ({"frame_skip": 0}, {"frame_skip": [3, 2]},
+                {"render_mode": "bogus"}, {"hard_reset_prob": 1.5}):
+        with pytest.raises(ValueError):
+            reconfigure_vec_env(vec_env, config, **bad)
+    assert config["env_kwargs"] == {"pipe_gap": 150, "score_limit": 3}
+    vec_env.reset()
+    assert vec_env.get_attr("_frame_skip_range") == [(1, 1), (1, 1)]
+
+    # and a bad config applied directly leaves the env as it was
+    env = vec_env.envs[0].unwrapped
+    with pytest.raises(ValueError):
+        env._configure(pipe_gap=90, frame_skip=0)
+    assert env.get_config()["pipe_gap"] == 150
+    env.reset()
+    assert env._pipe_gap == 150
+
+
+def test_get_config_with_shared_reservoir():
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from custom_flappy_bird.gym_env.custom_flappy_env import (
+        CustomFlappyBirdEnv)
+    from custom_flappy_bird.gym_env.hard_states import HardStateReservoir
+    reservoir = HardStateReservoir(capacity=8, shared=True)
+    # the class itself, as the registration is not there in the workers
+    vec_env = make_vec_env(
+        CustomFlappyBirdEnv, n_envs=2, vec_env_cls=SubprocVecEnv,
+        env_kwargs={"hard_reset_prob": 0.5,
+                    "hard_state_reservoir": reservoir})
+    try:
+        configs = vec_env.env_method("get_config")
+        assert configs[0]["hard_state_reservoir"] == \
+            "HardStateReservoir(capacity=8, shared=True)"
+        assert configs[1]["hard_reset_prob"] == 0.5
+    finally:
+        vec_env.close()
+        reservoir.close()
+
+
+def test_frame_skip():
+    env = gymnasium.make("customflappybird").unwrapped
+    skip_env = gymnasium.make(
+        "customflappybird",
+        frame_skip=4,
+        render_mode="rgb_array",
+        render_skipped_frames=True,
+    ).unwrapped
+    env.reset(seed=3)
+    skip_env.reset(seed=3)
+
+    obs, reward, terminated, _, info = skip_env.step(0)
+    assert info["frames"] == 4
+    frames = skip_env.render()
+    assert len(frames) == 4 and frames[0].shape == (512, 288, 3)
+    expected_reward = 0
+    for _ in range(4):
+        expected_obs, r, *_ = env.step(0)
+        expected_reward += r
+    assert np.array_equal(obs, expected_obs)
+    assert reward == pytest.approx(expected_reward)
+
+    # stops early when the bird hits the ground
+    while not terminated:
+        _, _, terminated, _, info = skip_env.step(0)
+    assert 1 <= info["frames"] <= 4
+    assert info["score"] == 0
+
+    # frames nobody renders are not kept past the next step
+    skip_env.reset(seed=3)
+    for _ in range(10):
+        skip_env.step(0)
+        assert len(skip_env._skipped_frames) <= 3
+    # and are not rendered at all while capture is off
+    skip_env.set_skipped_frame_capture(False)
+    skip_env.reset(seed=3)
+    skip_env.step(0)
+    assert skip_env._skipped_frames == []
+    assert skip_env.render().shape == (512, 288, 3)
+    skip_env.set_skipped_frame_capture(True)
+
+    skip_env.reconfigure(frame_skip=[2, 3])
+    skips = set()
+    for seed in range(20):
+        skip_env.reset(seed=seed)
+        skips.add(skip_env.step(0)[-1]["frames"])
+    assert skips == {2, 3}
+
+
+def test_memory_stats(tmp_path):
+    import os
+    import tracemalloc
+    from stable_baselines3.common.env_util import make_vec_env
+    vec_env = make_vec_env("customflappybird", n_envs=2)
+    stats = vec_env.env_method("memory_stats")
+    assert [s["pid"] for s in stats] == [os.getpid()] * 2
+    assert all(s["rss_mb"] > 0 for s in stats)
+
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        tracemalloc.stop()
+    try:
+        # or with trace, for snapshots without the top allocations
+        stats = vec_env.env_method("memory_stats", 0, True, indices=[0])[0]
+        assert tracemalloc.is_tracing() and "top" not in stats
+        tracemalloc.stop()
+        # tracing starts with the first call asking for top allocations
+        vec_env.env_method("memory_stats", 3, indices=[0])
+        vec_env.reset()
+        stats = vec_env.env_method("memory_stats", 3, indices=[0])[0]
+        assert stats["traced_mb"] > 0 and len(stats["top"]) == 3
+        path = vec_env.env_method(
+            "dump_heap_snapshot", str(tmp_path / "heap.pickle"),
+            indices=[0])[0]
+        assert tracemalloc.Snapshot.load(path).traces
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def test_check_crash_matches_parent():
+    from flappy_bird_gymnasium import FlappyBirdEnv
+    env = gymnasium.make("customflappybird").unwrapped
+    rng = np.random.default_rng(0)
+    crashes = 0
+    # states along random trajectories
+    for seed in range(20):
+        env.reset(seed=seed)
+        flap_prob = rng.uniform(0.03, 0.15)
+        terminated = truncated = False
+        while not (terminated or truncated):
+            assert env._check_crash() == FlappyBirdEnv._check_crash(env)
+            _, _, terminated, truncated, _ = env.step(
+                int(rng.random() < flap_prob))
+        crashes += FlappyBirdEnv._check_crash(env)
+    assert crashes > 0
+
+    # and states placed around the pipe edges, with float coordinates
+    env.reset(seed=0)
+    hits = 0
+    for _ in range(5000):
+        for i, (up, low) in enumerate(zip(env._upper_pipes,
+                                          env._lower_pipes)):
+            up["x"] = low["x"] = env._player_x + rng.uniform(-60, 40) \
+                + 150 * i
+            up["y"] = rng.integers(-250, -150) + rng.choice([0, 0.4, -0.4])
+            low["y"] = up["y"] + 320 + 100
+        gap_top = env._upper_pipes[0]["y"] + 320
+        env._player_y = gap_top + rng.uniform(-30, 110)
+        hits += env._check_crash()
+        assert env._check_crash() == FlappyBirdEnv._check_crash(env)
+    assert 1000 < hits < 4000
@@ -0,0 +1,204 @@
+import time
+import numpy as np
+import gymnasium
+from gymnasium.envs.registration import register
+
+# Also registered by test_env.py
+if "customflappybird" not in gymnasium.registry:
+    register(
+        id="customflappybird",
+        entry_point=(
+            "custom_flappy_bird.gym_env.custom_flappy_env:CustomFlappyBirdEnv"
+        ),
+    )
+
+
+def test_numpy_policy_matches_sb3(tmp_path):
+    from stable_baselines3 import PPO
+    from custom_flappy_bird.utils.numpy_policy import (
+        NumpyPolicy, export_policy, evaluate_numpy_policy)
+    model = PPO("MlpPolicy", gymnasium.make("customflappybird"), seed=0)
+    model.save(tmp_path / "best_model.zip")
+    npz = export_policy(str(tmp_path / "best_model.zip"))
+    policy = NumpyPolicy.load(npz, seed=0)
+
+    obs = np.random.default_rng(0).uniform(-1, 1, size=(256, 12))
+    expected, _ = model.predict(obs, deterministic=True)
+    actions, _ = policy.predict(obs, deterministic=True)
+    assert np.array_equal(actions, expected)
+    assert policy.predict(obs[0], deterministic=True)[0] == expected[0]
+
+    # stochastic actions follow sb3's action probabilities
+    probs = model.policy.get_distribution(
+        model.policy.obs_to_tensor(obs[:1])[0]).distribution.probs
+    samples, _ = policy.predict(np.repeat(obs[:1], 20000, axis=0))
+    assert abs(samples.mean() - probs[0, 1].item()) < 0.02
+
+    envs = gymnasium.make_vec("customflappybird", num_envs=2)
+    rewards, lengths = evaluate_numpy_policy(
+        policy, envs, n_eval_episodes=3, seed=0, return_episode_rewards=True)
+    assert len(rewards) == len(lengths) == 3
+    envs.close()
+
+
+def test_tournament_same_episodes(tmp_path):
+    from custom_flappy_bird.utils.numpy_policy import NumpyPolicy
+    from custom_flappy_bird.utils.tournament import (
+        make_tournament_envs, run_tournament, save_results)
+    rng = np.random.default_rng(0)
+    weights = [(rng.normal(size=(12, 8)), rng.normal(size=8)),
+               (rng.normal(size=(8, 2)), rng.normal(size=2))]
+    policies = {"a": NumpyPolicy(weights), "b": NumpyPolicy(weights),
+                "flap": NumpyPolicy([(np.zeros((12, 2)), [0, 1])])}
+    envs = make_tournament_envs(
+        "customflappybird", num_envs=4, vectorization_mode="sync")
+    table = run_tournament(policies, envs, n_eval_episodes=5, seed=0)
+    envs.close()
+
+    assert [row["rank"] for row in table] == [1, 2, 3]
+    rows = {row["name"]: row for row in table}
+    assert all(row["episodes"] == 5 for row in table)
+    # identical policies play identical episodes
+    for key in ("mean_reward", "mean_score", "mean_length", "steps"):
+        assert rows["a"][key] == rows["b"][key]
+    save_results(table, tmp_path)
+    assert (tmp_path / "results.csv").read_text().count("\n") == 4
+
+
+def test_inference_server_matches_local_policy():
+    from custom_flappy_bird.utils.numpy_policy import NumpyPolicy
+    from custom_flappy_bird.utils.inference_server import (
+        PolicyServer, PolicyClient, evaluate_with_server, rollout_worker)
+    rng = np.random.default_rng(0)
+    policy = NumpyPolicy([(rng.normal(size=(12, 8)), rng.normal(size=8)),
+                          (rng.normal(size=(8, 2)), rng.normal(size=2))])
+    obs = rng.uniform(-1, 1, size=(64, 12))
+    with PolicyServer(policy, (12,)) as server:
+        client = PolicyClient(server.socket_path, (12,))
+        expected, _ = policy.predict(obs, deterministic=True)
+        assert np.array_equal(client.predict(obs)[0], expected)
+        assert client.predict(obs[0])[0] == expected[0]
+        client.close()
+        local = rollout_worker("customflappybird", {}, server.socket_path,
+                               [3, 4])
+
+    results = evaluate_with_server(policy, "customflappybird", n_workers=2,
+                                   n_eval_episodes=5)
+    assert len(results) == 5
+    # same seeds give the same episodes as a single worker
+    assert set(local) <= set(results)
+
+
+def test_trace_roundtrip(tmp_path):
+    from custom_flappy_bird.utils.trace import (
+        RecordTrace, TraceReader, iter_episodes)
+    env = RecordTrace(gymnasium.make("customflappybird"), tmp_path,
+                      chunk_size=64)
+    expected = []
+    for seed in range(3):
+        obs, _ = env.reset(seed=seed)
+        steps, done = [], False
+        while not done:
+            action = int(obs[9] > 0)  # flap when falling fast
+            next_obs, reward, terminated, truncated, info = env.step(action)
+            steps.append((obs, action, reward))
+            obs, done = next_obs, terminated or truncated
+        expected.append((steps, info["score"]))
+    env.reset()
+    env.step(0)  # unfinished episode, not indexed
+    env.close()
+
+    (folder,) = list(tmp_path.iterdir())
+    reader = TraceReader(folder)
+    assert len(reader) == 3
+    assert reader.length == sum(len(steps) for steps, _ in expected) + 1
+    for episode, (steps, score) in zip(reader, expected):
+        assert np.array_equal(episode["obs"], [s[0] for s in steps])
+        assert np.array_equal(episode["action"], [s[1] for s in steps])
+        assert np.allclose(episode["reward"], [s[2] for s in steps])
+        assert episode["done"][-1] and not episode["done"][:-1].any()
+        assert episode["score"][-1] == score
+    assert len(list(iter_episodes(tmp_path, max_episodes=2))) == 2
+
+
+class _ListWriter:
+    def __init__(self):
+        self.scalars = []
+
+    def add_scalar(self, tag, value, step):
+        self.scalars.append((tag, float(value), step))
+
+    def flush(self):
+        pass
+
+
+def test_metrics_sink_drops_oldest():
+    from custom_flappy_bird.utils.metrics import MetricsSink
+    writer = _ListWriter()
+    sink = MetricsSink(writer=writer, flush_interval=60, capacity=4)
+    for value in range(10):
+        sink.record("perf/x", value)
+    sink.set_step(10)
+    sink.flush()
+    scalars = {tag: (value, step) for tag, value, step in writer.scalars}
+    assert scalars["perf/x/mean"] == (7.5, 10)
+    assert scalars["perf/x/min"][0] == 6 and scalars["perf/x/max"][0] == 9
+    assert scalars["perf/x/count"][0] == 4
+    assert scalars["metrics_sink/dropped"][0] == 6
+
+    # the background thread flushes on its own
+    writer.scalars.clear()
+    sink.close()
+    sink = MetricsSink(writer=writer, flush_interval=0.01)
+    sink.record("y", 1.0)
+    deadline = time.time() + 5
+    while not writer.scalars and time.time() < deadline:
+        time.sleep(0.01)
+    sink.close()
+    assert ("y/count", 1.0, 0) in writer.scalars
+
+
+def test_gif_writer_streams_frames(tmp_path):
+    import imageio
+    from custom_flappy_bird.utils.video import get_video_writer
+    frames = [np.full((16, 24, 3), 10 * i, dtype=np.uint8) for i in range(5)]
+    frames[2][4:8, 4:8] = [255, 0, 0]
+    writer = get_video_writer(tmp_path / "a.gif", fps=25)
+    for frame in frames:
+        writer.append_data(frame)
+    writer.close()
+    read = imageio.mimread(tmp_path / "a.gif")
+    assert len(read) == 5
+    for frame, expected in zip(read, frames):
+        assert np.array_equal(frame[..., :3], expected)
+
+
+def test_inference_server_reports_predict_errors():
+    import pytest
+    from custom_flappy_bird.utils.inference_server import (
+        PolicyServer, PolicyClient)
+
+    class FlakyPolicy:
+        def predict(self, obs, deterministic=True):
+            if obs[0, 0] < 0:
+                raise ValueError("bad observation")
+            return np.ones(len(obs), dtype=int), None
+
+    with PolicyServer(FlakyPolicy(), (12,)) as server:
+        client = PolicyClient(server.socket_path, (12,))
+        with pytest.raises(RuntimeError, match="bad observation"):
+            client.predict(-np.ones(12))
+        # the server and the connection keep working
+        assert client.predict(np.ones(12))[0] == 1
+        client.close()
+
+
+def test_mp4_writer_odd_frame_size(tmp_path):
+    import imageio
+    from custom_flappy_bird.utils.video import get_video_writer
+    writer = get_video_writer(tmp_path / "a.mp4", fps=30)
+    for i in range(5):
+        writer.append_data(np.full((171, 97, 3), 40 * i, dtype=np.uint8))
+    writer.close()
+    read = imageio.mimread(tmp_path / "a.mp4")
+    assert len(read) == 5 and read[0].shape == (170, 96, 3)